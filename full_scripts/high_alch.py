@@ -1,26 +1,38 @@
+import argparse
 import asyncio
 import random
 from datetime import datetime, timedelta
 
-import pyautogui
 from PIL import ImageDraw
-from pyHM import mouse
 
-from utils.assets_path_loader import load_assets
+from utils.assets_path_loader import AssetRegistry
+from utils.capture_backends import ReplayBackend
+from utils.change_detection import ChangeDetector
 from utils.custom_logger import setup_logging
-from utils.image_loader import ImageLoader
-from utils.overlay import OverlayDrawer
-from utils.screen_capture import ScreenCapture
-from utils.vision_tools import locate_on_screen
+from utils.frame_pipeline import FramePipeline
+from utils.overlay import OverlayThread
+from utils.screen_capture import DEFAULT_ROIS, ScreenCapture
+from utils.template_cache import TemplateCache
+from utils.vision_tools import LocationPrior, click_location, debug_sink, wait_for_template
 
 # Set up logging
-logger = setup_logging(log_to_file=True)
+logger = setup_logging(log_to_file=True, use_queue=True).get_logger(__name__)  # Log I/O off the hot path
 
 # Load assets and initialize tools
-assets = load_assets()
-loader = ImageLoader()
-screen_capture = ScreenCapture(app_name="RuneLite")
-overlay = OverlayDrawer(title="Alching Statistics")  # Initialize the overlay before the loop
+assets = AssetRegistry()  # Indexes and decodes assets lazily, on first use
+template_cache = TemplateCache()  # The sprites prepare in a few ms, an on-disk store would not be faster
+screen_capture = ScreenCapture()  # The application (or a replay source) is selected in main()
+APP_NAME = "RuneLite"
+# Named ROI to capture and search, or None for the whole client. The DEFAULT_ROIS offsets assume the fixed-size
+# classic layout, so a panel ROI is opt-in (--roi) rather than the default.
+CAPTURE_ROI = None
+pipeline = FramePipeline(screen_capture, roi=CAPTURE_ROI)  # Stage timings and the captured ROI
+location_prior = LocationPrior()  # Searches around each sprite's last location before the whole region
+change_detector = ChangeDetector()  # Lets waits skip frames in which the captured region did not change
+
+# Seconds to wait for the spell icon and the item to appear
+SPELL_TIMEOUT = 3.0
+ITEM_TIMEOUT = 6.0
 
 # Constants for calculations
 ALCH_EXP = 65  # Experience per alch
@@ -30,93 +42,104 @@ OUTPUT_VALUE = 810  # Coin value per alch
 INPUT_COST = RUNE_COST + ITEM_COST
 
 
-def get_random_offset_position(x, y, offset_range=3):
-    """Generate a random offset position around a given x, y coordinate."""
-    offset_x = random.randint(-offset_range, offset_range)
-    offset_y = random.randint(-offset_range, offset_range)
-    return x + offset_x, y + offset_y
+def click(location, dry_run=False):
+    """Click at the given location, or only log it in dry-run mode."""
+    if dry_run:
+        logger.debug("Dry run, skipping click at %s", location)
+        return
+    from pyHM import mouse  # Imported lazily so replay runs work without a display
+    mouse.click(*location)
 
 
-def save_debug_image(image, location, file_name, box=None):
-    """Save a debug image with optional location marking and bounding box."""
-    draw = ImageDraw.Draw(image)
-    dot_size = 5
-    draw.ellipse(
-        [(location[0] - dot_size, location[1] - dot_size), (location[0] + dot_size, location[1] + dot_size)],
-        fill="red"
-    )
-    if box:
-        draw.rectangle(box, outline="green", width=2)
-    image.save(f"screenshots/{file_name}")
-
-
-async def make_action(target_image, screen, offset_range=3, debug=False, iteration=0, confidence=0.5):
-    """Locate the target image on screen and return the random click location."""
-    location = locate_on_screen(target_image, screen, debug=debug, iteration=iteration, confidence=confidence)
-    if location:
-        center_x = location.left + location.width // 2
-        center_y = location.top + location.height // 2
-        random_location = get_random_offset_position(center_x, center_y, offset_range)
-        bounding_box = (location.left, location.top, location.left + location.width, location.top + location.height)
-        if debug:
-            save_debug_image(screen, random_location, f"click_{iteration}.png", box=bounding_box)
-        return random_location
-    return None
-
+def press(key, dry_run=False):
+    """Press a key, or only log it in dry-run mode."""
+    if dry_run:
+        logger.debug("Dry run, skipping key press '%s'", key)
+        return
+    import pyautogui  # Imported lazily so replay runs work without a display
+    pyautogui.press(key)
 
-def load_target_images():
-    """Load target images from assets."""
-    return {name: loader.load_image(path) for name, path in assets['items'].items()}
 
-
-async def retry_until_found(target_image, screen_capture, loader, max_retries=10, confidence=0.5, debug=False,
-                            iteration=0):
-    """Retry finding and clicking the target image until found or max retries."""
-    retries = 0
-    while retries < max_retries:
-        screen_capture.capture_to_disk('screenshots/temp.png')
-        screen = loader.load_image('screenshots/temp.png')
-        location = await make_action(target_image, screen, confidence=confidence, debug=debug, iteration=iteration)
+def save_debug_image(image, location, file_name, box=None, iteration=None, failure=False):
+    """
+    Queue a debug image with optional location marking and bounding box on the debug sink. Drawing,
+    encoding and writing happen on the sink's writer thread, subject to its sampling settings.
+    """
+    def mark(img):
+        draw = ImageDraw.Draw(img)
         if location:
-            return location
-        retries += 1
-        logger.debug(f"Retrying... ({retries}/{max_retries})")
-        await asyncio.sleep(random.uniform(0.25, 1.0))
-
-    logger.warning("Failed to find the target image after maximum retries.")
-    raise ValueError("Failed to locate image on screen after maximum retries.")
+            dot_size = 5
+            draw.ellipse(
+                [(location[0] - dot_size, location[1] - dot_size), (location[0] + dot_size, location[1] + dot_size)],
+                fill="red"
+            )
+        if box:
+            draw.rectangle(box, outline="green", width=2)
+
+    debug_sink.save_image(image, file_name, iteration=iteration, failure=failure, annotate=mark)
+
+
+def load_target_images(*names):
+    """Load the named item images from assets, prepared for matching. Other items are never read."""
+    return {name: template_cache.get(assets.path('items', name)) for name in names}
+
+
+async def retry_until_found(target_image, pipeline, timeout=5.0, confidence=0.5, debug=False, iteration=0):
+    """
+    Wait until the target image appears in the captured region and return a click location near it,
+    in screen coordinates. Raises ValueError if it does not appear within `timeout` seconds.
+    """
+    location, searched = await wait_for_template(target_image, screen_capture, timeout=timeout,
+                                                 confidence=confidence, locate=location_prior.locate,
+                                                 detector=change_detector, pipeline=pipeline, with_frame=True)
+    pipeline.log_latency()
+    frame = searched if debug else None  # The boxes are relative to the searched frame
+    if not location:
+        logger.warning(f"Target image did not appear within {timeout} seconds.")
+        if frame is not None:
+            save_debug_image(frame, None, f"miss_{iteration}.png", iteration=iteration, failure=True)
+            debug_sink.save_text(f"Target image did not appear within {timeout} seconds.",
+                                 f"miss_{iteration}.txt", iteration=iteration, failure=True)
+        raise ValueError("Failed to locate image on screen before the timeout.")
+
+    random_location = click_location(location)
+    if frame is not None:
+        bounding_box = (location.left, location.top, location.left + location.width, location.top + location.height)
+        save_debug_image(frame, random_location, f"click_{iteration}.png", box=bounding_box, iteration=iteration)
+    # Matches are relative to the searched frame, pyHM clicks at absolute screen positions
+    return searched.left + random_location[0], searched.top + random_location[1]
 
 
-async def reset_procedure():
+async def reset_procedure(dry_run=False):
     """Perform a reset by pressing 'esc' three times and then pressing '3'."""
     logger.info("Performing reset procedure.")
     for _ in range(3):
-        pyautogui.press('esc')
+        press('esc', dry_run)
         await asyncio.sleep(0.2)
-    pyautogui.press('3')
+    press('3', dry_run)
     logger.info("Reset complete, resuming script.")
 
 
-async def cast_spell(spell, screen_capture, loader, confidence, debug, iteration):
+async def cast_spell(spell, pipeline, confidence, debug, iteration, dry_run=False):
     """Attempt to cast the spell by locating it on the screen."""
-    spell_location = await retry_until_found(spell, screen_capture, loader, max_retries=5, confidence=confidence,
+    spell_location = await retry_until_found(spell, pipeline, timeout=SPELL_TIMEOUT, confidence=confidence,
                                              debug=debug, iteration=iteration)
     if spell_location:
-        mouse.click(*spell_location)
-        logger.info(f"Spell cast at {spell_location}")
+        click(spell_location, dry_run)
+        logger.info("Spell cast at %s", spell_location)
         await asyncio.sleep(random.uniform(0.25, 0.5))
         return True
     logger.warning("Spell not found on screen.")
     return False
 
 
-async def alch_item(item, screen_capture, loader, confidence, debug, iteration):
+async def alch_item(item, pipeline, confidence, debug, iteration, dry_run=False):
     """Attempt to alch the item by locating it on the screen."""
-    item_location = await retry_until_found(item, screen_capture, loader, max_retries=10, confidence=confidence,
+    item_location = await retry_until_found(item, pipeline, timeout=ITEM_TIMEOUT, confidence=confidence,
                                             debug=debug, iteration=iteration)
     if item_location:
-        mouse.click(*item_location)
-        logger.info(f"Item alched at {item_location}")
+        click(item_location, dry_run)
+        logger.info("Item alched at %s", item_location)
         return True
     logger.warning("Item not found on screen.")
     return False
@@ -146,7 +169,7 @@ def format_time(seconds_left):
 
 
 def update_statistics_overlay(overlay, start_time, iterations, num_iterations, total_exp, total_profit, total_value):
-    """Updates the overlay with the current statistics."""
+    """Updates the overlay with the current statistics. With an OverlayThread this only queues the text."""
     time_elapsed = datetime.now() - start_time
 
     if time_elapsed.total_seconds() > 0:
@@ -183,9 +206,14 @@ def update_statistics_overlay(overlay, start_time, iterations, num_iterations, t
 
 
 async def perform_high_alchemy(spell_name, item_name, num_iterations, max_iterations=100, max_time_minutes=10,
-                               spell_confidence=0.6, item_confidence=0.3):
-    """Main loop to perform high alchemy for a specified number of iterations or time."""
-    items = load_target_images()
+                               spell_confidence=0.6, item_confidence=0.3, capture_fps=30, overlay=None,
+                               dry_run=False, debug=True):
+    """
+    Main loop to perform high alchemy for a specified number of iterations or time.
+    Statistics are shown on `overlay` if given; with `dry_run`, clicks and key presses are only logged.
+    With `debug`, click and miss images are queued on `debug_sink`, which samples and writes them in the background.
+    """
+    items = load_target_images(spell_name, item_name)
     spell = items.get(spell_name)
     target_item = items.get(item_name)
 
@@ -196,38 +224,91 @@ async def perform_high_alchemy(spell_name, item_name, num_iterations, max_iterat
     total_value = 0
     total_profit = 0
 
-    while iterations < max_iterations and datetime.now() < end_time:
-        if iterations >= num_iterations:
-            logger.info("Reached the specified number of iterations.")
-            break
-
-        try:
-            if await cast_spell(spell, screen_capture, loader, spell_confidence, debug=True, iteration=iterations):
-                if await alch_item(target_item, screen_capture, loader, item_confidence, debug=True,
-                                   iteration=iterations):
-                    iterations += 1
-                    total_exp += ALCH_EXP
-                    total_profit += OUTPUT_VALUE - INPUT_COST
-                    total_value += OUTPUT_VALUE
-
-                    update_statistics_overlay(overlay, start_time, iterations, num_iterations, total_exp, total_profit,
-                                              total_value)
-
-                    logger.debug(f"Iteration {iterations} complete.")
-        except ValueError as e:
-            logger.error(f"Error encountered during iteration {iterations}: {str(e)}")
-            await reset_procedure()
-
-        await asyncio.sleep(random.uniform(0.05, 0.25))
+    # Grab frames on a background thread so the loop never waits on capture
+    screen_capture.start_background_capture(fps=capture_fps, roi=pipeline.roi)
+    try:
+        while iterations < max_iterations and datetime.now() < end_time:
+            if iterations >= num_iterations:
+                logger.info("Reached the specified number of iterations.")
+                break
+
+            try:
+                if await cast_spell(spell, pipeline, spell_confidence, debug=debug, iteration=iterations,
+                                    dry_run=dry_run):
+                    if await alch_item(target_item, pipeline, item_confidence, debug=debug, iteration=iterations,
+                                       dry_run=dry_run):
+                        iterations += 1
+                        total_exp += ALCH_EXP
+                        total_profit += OUTPUT_VALUE - INPUT_COST
+                        total_value += OUTPUT_VALUE
+
+                        if overlay:
+                            update_statistics_overlay(overlay, start_time, iterations, num_iterations, total_exp,
+                                                      total_profit, total_value)
+
+                        logger.debug("Iteration %d complete.", iterations)
+            except ValueError as e:
+                logger.error(f"Error encountered during iteration {iterations}: {str(e)}")
+                await reset_procedure(dry_run)
+
+            await asyncio.sleep(random.uniform(0.05, 0.25))
+    finally:
+        screen_capture.stop_background_capture()
+        debug_sink.close()
+        pipeline.close()
 
     logger.info(
         f"Script stopped after {iterations} iterations due to reaching the specified number of iterations or timeout.")
+    logger.info(f"Mean frame pipeline latency (ms): {pipeline.latency_report()}")
+    logger.info(f"Location prior: {location_prior.hits} found near the last location, "
+                f"{location_prior.misses} widened to the full region")
+    logger.info(f"Debug artifacts: {debug_sink.written} written, {debug_sink.dropped} dropped")
+
+
+async def main(replay=None, speed=None, debug_every=10, debug_failures_only=False, overlay_fps=4.0, roi=CAPTURE_ROI):
+    """
+    Run against the live client, or headlessly against recorded frames when `replay` is given.
+    Debug images are kept every `debug_every` iterations (0 for none) and on every miss.
+    The statistics overlay runs on its own Tk thread and redraws at most `overlay_fps` times per second.
+    With `roi`, only that named ScreenCapture region is captured and searched instead of the whole client.
+    """
+    pipeline.roi = roi
+    debug_sink.every_n = debug_every
+    debug_sink.failures_only = debug_failures_only
+    if replay:
+        screen_capture.set_backend(ReplayBackend(replay, speed=speed))
+        overlay = None
+    else:
+        overlay = OverlayThread(title="Alching Statistics", max_fps=overlay_fps)
+        overlay.start()
+    screen_capture.set_application(APP_NAME)
 
-
-async def main():
-    await perform_high_alchemy('high-alch', 'rune-jav-head', num_iterations=5000, max_iterations=5000,
-                               max_time_minutes=11 * 30, spell_confidence=0.53, item_confidence=0.35)
+    try:
+        await perform_high_alchemy('high-alch', 'rune-jav-head', num_iterations=5000, max_iterations=5000,
+                                   max_time_minutes=11 * 30, spell_confidence=0.53, item_confidence=0.35,
+                                   overlay=overlay, dry_run=bool(replay))
+    finally:
+        if overlay:
+            logger.info(f"Overlay: {overlay.drawn} updates drawn, {overlay.coalesced} coalesced")
+            overlay.stop()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Automate high alchemy in the RuneLite client.")
+    parser.add_argument('--replay', help="Replay frames from this directory instead of capturing the client. "
+                                         "Clicks are skipped, so this runs headless for benchmarking.")
+    parser.add_argument('--speed', type=float, default=None,
+                        help="Replay speed relative to the recorded timing. By default frames are served as fast "
+                             "as they are requested.")
+    parser.add_argument('--debug-every', type=int, default=10,
+                        help="Save a click debug image every N iterations (0 disables them). Default is 10.")
+    parser.add_argument('--debug-failures-only', action='store_true',
+                        help="Only save debug artifacts when a target is not found.")
+    parser.add_argument('--overlay-fps', type=float, default=4.0,
+                        help="Maximum statistics overlay redraws per second. Default is 4.")
+    parser.add_argument('--roi', choices=sorted(DEFAULT_ROIS), default=CAPTURE_ROI,
+                        help="Only capture and search this panel. Its offsets assume the fixed-size classic layout; "
+                             "by default the whole client is searched.")
+    args = parser.parse_args()
+    asyncio.run(main(args.replay, args.speed, args.debug_every, args.debug_failures_only, args.overlay_fps,
+                     args.roi))
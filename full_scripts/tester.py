@@ -5,11 +5,10 @@ import os
 from PIL import ImageDraw, Image
 from icecream import ic
 
-from full_scripts.high_alch import make_action
-from utils.assets_path_loader import load_assets
+from utils.assets_path_loader import AssetRegistry
 from utils.image_loader import ImageLoader
-from utils.overlay import OverlayDrawer
-from utils.vision_tools import locate_on_screen
+from utils.overlay_renderer import OverlayRenderer
+from utils.vision_tools import click_location, locate_on_screen
 
 # Set up logging
 logging.basicConfig(filename='detection_report.log', level=logging.INFO,
@@ -20,12 +19,12 @@ output_dir = os.path.join(os.path.dirname(__file__), 'test_outputs')
 os.makedirs(output_dir, exist_ok=True)
 
 # Load assets and initialize necessary classes
-assets = load_assets()
+assets = AssetRegistry()
 loader = ImageLoader()
-drawer = OverlayDrawer()
+renderer = OverlayRenderer(font_size=12)  # Headless, so the tester runs without a display
 
 # Debugging: Show loaded assets
-ic(assets)
+ic(assets.categories())
 conf = 0.95
 
 
@@ -41,63 +40,58 @@ def concatenate_images(target_image, screen):
     return concatenated_image
 
 
-async def test_object_detection(item_name, screen_name, screen_path):
+async def test_object_detection(item_name, screen_name):
     """Test object detection by locating and drawing a bounding box on the target image."""
-    # Load the target image based on the item name
-    target_image = loader.load_image(assets['items'][item_name])
+    # Load the target image based on the item name; decoded images are cached by the registry. Both images
+    # are kept at their native size, as high_alch matches sprites against unscaled captures.
+    target_image = assets.load('items', item_name).convert('RGB')
 
-    # Load the current screen
-    screen = loader.load_image(screen_path)
+    # Load the current screen, converted to a copy because it is drawn on
+    screen = assets.load('screens', screen_name).convert('RGB')
 
-    # Perform action to locate and calculate the random click position
-    click_position = await make_action(target_image, screen, offset_range=3, debug=False, confidence=conf)
+    # Locate the target and calculate the random click position
+    location = locate_on_screen(target_image, screen, confidence=conf)
+
+    if location:
+        click_position = click_location(location, offset_range=3)
 
-    if click_position:
         # Draw a bounding box around the detected target
-        location = locate_on_screen(target_image, screen, confidence=conf)
-        if location:
-            left, top, width, height = location.left, location.top, location.width, location.height
-            right = left + width
-            bottom = top + height
-            bbox = (left, top, right, bottom)
-
-            draw = ImageDraw.Draw(screen)
-            draw.rectangle(bbox, outline="red", width=3)
-
-            # Draw a green dot where the "click" would occur
-            draw.ellipse(
-                (click_position[0] - 2, click_position[1] - 2, click_position[0] + 2, click_position[1] + 2),
-                fill="green",
-                outline="green"
-            )
-
-            # Concatenate the target image and the screen
-            output_image = concatenate_images(target_image, screen)
-
-            # Save the modified image with a unique name
-            output_filename = os.path.join(output_dir, f"test_output_{item_name}_{screen_name}.png")
-            loader.save_image(output_image, output_filename)
-
-            # Log success and save report
-            message = f"Item '{item_name}' successfully detected on screen '{screen_name}'."
-            logging.info(message)
-            print(message)
-        else:
-            message = f"Target '{item_name}' not found on the screen '{screen_name}'."
-            logging.warning(message)
-            print(message)
-
-            # Concatenate the target image and the screen even on failure
-            output_image = concatenate_images(target_image, screen)
-            output_filename = os.path.join(output_dir, f"failure_output_{item_name}_{screen_name}.png")
-            loader.save_image(output_image, output_filename)
+        left, top, width, height = location.left, location.top, location.width, location.height
+        right = left + width
+        bottom = top + height
+        bbox = (left, top, right, bottom)
+
+        draw = ImageDraw.Draw(screen)
+        draw.rectangle(bbox, outline="red", width=3)
+
+        # Draw a green dot where the "click" would occur
+        draw.ellipse(
+            (click_position[0] - 2, click_position[1] - 2, click_position[0] + 2, click_position[1] + 2),
+            fill="green",
+            outline="green"
+        )
+
+        # Concatenate the target image and the screen, and stamp the result on it
+        output_image = concatenate_images(target_image, screen)
+        output_image = renderer.composite(output_image, f"<color=lightgreen>Found</color> {item_name} "
+                                                        f"<color=lightblue>at {location.left}, {location.top}</color>")
+
+        # Save the modified image with a unique name
+        output_filename = os.path.join(output_dir, f"test_output_{item_name}_{screen_name}.png")
+        loader.save_image(output_image, output_filename)
+
+        # Log success and save report
+        message = f"Item '{item_name}' successfully detected on screen '{screen_name}'."
+        logging.info(message)
+        print(message)
     else:
-        message = f"Click position for item '{item_name}' could not be determined on screen '{screen_name}'."
-        logging.error(message)
+        message = f"Target '{item_name}' not found on the screen '{screen_name}'."
+        logging.warning(message)
         print(message)
 
         # Concatenate the target image and the screen even on failure
         output_image = concatenate_images(target_image, screen)
+        output_image = renderer.composite(output_image, f"<color=red>Not found</color> {item_name}")
         output_filename = os.path.join(output_dir, f"failure_output_{item_name}_{screen_name}.png")
         loader.save_image(output_image, output_filename)
 
@@ -112,8 +106,8 @@ async def main():
     tasks = []
 
     for item_name in item_names:
-        for screen_name, screen_path in assets['screens'].items():
-            task = asyncio.create_task(test_object_detection(item_name, screen_name, screen_path))
+        for screen_name in assets.paths('screens'):
+            task = asyncio.create_task(test_object_detection(item_name, screen_name))
             tasks.append(task)
 
     await asyncio.gather(*tasks)
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# The modules import each other as `utils.*`, so the repository root has to be importable.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(1234)
+
+
+@pytest.fixture
+def textured(rng):
+    """Factory of random uint8 images made of `cell`-pixel blocks, so they keep texture when downsampled."""
+    def make(height, width, channels=None, cell=4):
+        shape = (-(-height // cell), -(-width // cell)) + ((channels,) if channels else ())
+        small = rng.integers(0, 256, shape, dtype=np.uint8)
+        return np.repeat(np.repeat(small, cell, axis=0), cell, axis=1)[:height, :width].copy()
+    return make
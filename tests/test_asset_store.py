@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.asset_store import PreprocessedAssetStore
+from utils.image_loader import ImageLoader
+
+
+@pytest.fixture
+def sources(tmp_path, textured):
+    directory = tmp_path / 'screens'
+    directory.mkdir()
+    paths = {}
+    for name in ('bank', 'inventory'):
+        paths[name] = str(directory / f'{name}.png')
+        Image.fromarray(textured(24, 32, channels=3)).save(paths[name])
+    return paths
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PreprocessedAssetStore(ImageLoader(target_size=(16, 12), color_mode='RGB'), tmp_path / 'processed')
+
+
+def test_stored_arrays_are_mapped_after_a_restart(tmp_path, sources, store):
+    store.update(sources)
+
+    restarted = PreprocessedAssetStore(store.loader, tmp_path / 'processed')
+    array, scale = restarted.load('bank')
+
+    assert isinstance(array, np.memmap)
+    assert array.shape == (12, 16, 3)
+    assert scale == (0.5, 0.5)
+    assert all(restarted.is_current(name, source) for name, source in sources.items())
+
+
+def test_touched_source_with_same_content_is_current(sources, store):
+    store.update(sources)
+    stat = os.stat(sources['bank'])
+    os.utime(sources['bank'], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert store.is_current('bank', sources['bank'])
+    assert store.index['bank']['source_mtime_ns'] == stat.st_mtime_ns + 10 ** 9
+
+
+def test_changed_source_is_reprocessed(sources, store, textured):
+    store.update(sources)
+    before = {name: dict(entry) for name, entry in store.index.items()}
+    Image.fromarray(textured(24, 32, channels=3, cell=2)).save(sources['bank'])
+
+    assert not store.is_current('bank', sources['bank'])
+    store.update(sources)
+    assert store.index['bank']['source_hash'] != before['bank']['source_hash']
+    assert store.index['inventory'] == before['inventory']
+
+
+def test_new_loader_settings_or_missing_array_invalidate(tmp_path, sources, store):
+    store.update(sources)
+    resized = PreprocessedAssetStore(ImageLoader(target_size=(8, 6), color_mode='RGB'), tmp_path / 'processed')
+    (tmp_path / 'processed' / store.index['inventory']['file']).unlink()
+
+    assert not resized.is_current('bank', sources['bank'])
+    assert not store.is_current('inventory', sources['inventory'])
+    assert store.is_current('bank', sources['bank'])
+
+
+def test_iter_update_streams_changed_and_current_assets(sources, store):
+    store.update({'bank': sources['bank']})
+    pairs = [('bank', sources['bank']), ('inventory', sources['inventory']),
+             ('inventory', sources['bank']), ('missing', sources['bank'] + '.gone')]
+
+    results = dict(store.iter_update(pairs, workers=1, max_pending=1))
+
+    assert sorted(results) == ['bank', 'inventory']
+    assert results['inventory']['source'] == sources['inventory']
+    stats = store.last_stats
+    assert (stats['processed'], stats['up_to_date'], stats['failed']) == (1, 1, 2)  # Duplicate name, missing file
+    array, _ = store.load('inventory', mmap=False)
+    assert array.shape == (12, 16, 3)
+
+
+def test_iter_update_saves_the_index_when_stopped_early(tmp_path, sources, store):
+    stream = store.iter_update(sources, workers=1, max_pending=1)
+    first, _ = next(stream)
+    stream.close()
+
+    restarted = PreprocessedAssetStore(store.loader, tmp_path / 'processed')
+    assert first in restarted.index
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.assets_path_loader import AssetRegistry
+
+
+@pytest.fixture
+def root(tmp_path, textured):
+    (tmp_path / 'items').mkdir()
+    Image.fromarray(textured(8, 8, channels=3)).save(tmp_path / 'items' / 'rune.png')
+    return tmp_path
+
+
+def touch(path, offset_ns):
+    """Move the modification time, as an editor saving the file would."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + offset_ns))
+
+
+def test_decoded_images_are_cached(root):
+    registry = AssetRegistry(root)
+
+    assert registry.load('items', 'rune') is registry.load('items', 'rune')
+    assert (registry.misses, registry.hits) == (1, 1)
+
+
+def test_touched_file_with_same_content_stays_cached(root):
+    registry = AssetRegistry(root)
+    first = registry.load('items', 'rune')
+    touch(root / 'items' / 'rune.png', 10 ** 9)
+
+    assert registry.load('items', 'rune') is first
+    assert registry.misses == 1
+
+
+def test_changed_file_is_decoded_again(root, textured):
+    registry = AssetRegistry(root)
+    registry.load('items', 'rune')
+    replacement = textured(8, 8, channels=3, cell=2)
+    Image.fromarray(replacement).save(root / 'items' / 'rune.png')
+    touch(root / 'items' / 'rune.png', 10 ** 9)
+
+    np.testing.assert_array_equal(np.asarray(registry.load('items', 'rune')), replacement)
+    assert registry.misses == 2
+
+
+def test_new_files_are_indexed(root, textured):
+    registry = AssetRegistry(root)
+    assert list(registry.paths('items')) == ['rune']
+    Image.fromarray(textured(8, 8, channels=3)).save(root / 'items' / 'coins.png')
+    touch(root / 'items', 10 ** 9)
+
+    assert sorted(registry.paths('items')) == ['coins', 'rune']
+
+
+def test_cache_is_bounded_by_entries(root):
+    for name in ('coins', 'nature'):
+        (root / 'items' / f'{name}.png').write_bytes((root / 'items' / 'rune.png').read_bytes())
+    registry = AssetRegistry(root, max_entries=2)
+
+    for name in ('rune', 'coins', 'nature'):
+        registry.load('items', name)
+    registry.load('items', 'rune')
+
+    assert registry.misses == 4
+    assert registry.cached_bytes == 2 * 8 * 8 * 3
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from PIL import Image
+
+from utils import capture_backends
+from utils.capture_backends import SESSION_MANIFEST, CaptureError, ReplayBackend
+
+
+@pytest.fixture
+def frames(tmp_path, textured):
+    for index in range(3):
+        Image.fromarray(textured(6, 8, channels=3)).save(tmp_path / f'frame_{index}.png')
+    return tmp_path
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace time.perf_counter with a clock the test advances by setting `clock.now`."""
+    class Clock:
+        now = 100.0
+
+    monkeypatch.setattr(capture_backends.time, 'perf_counter', lambda: Clock.now)
+    return Clock
+
+
+def grab_indices(backend, count):
+    indices = []
+    for _ in range(count):
+        backend.grab({"left": 0, "top": 0, "width": 8, "height": 6})
+        indices.append(backend.frame_index)
+    return indices
+
+
+def test_frames_advance_one_per_grab_and_loop(frames):
+    assert grab_indices(ReplayBackend(frames), 5) == [0, 1, 2, 0, 1]
+
+
+def test_exhausted_source_raises_without_loop(frames):
+    backend = ReplayBackend(frames, loop=False)
+    grab_indices(backend, 3)
+
+    with pytest.raises(CaptureError, match="exhausted"):
+        backend.grab({"left": 0, "top": 0, "width": 8, "height": 6})
+
+
+def test_speed_follows_the_recorded_timestamps(frames, clock):
+    manifest = {'frames': [{'file': f'frame_{index}.png', 'timestamp': timestamp}
+                           for index, timestamp in enumerate([10.0, 10.5, 12.0])]}
+    (frames / SESSION_MANIFEST).write_text(json.dumps(manifest))
+    backend = ReplayBackend(frames, speed=2.0)
+
+    indices = []
+    for elapsed in (0.0, 0.2, 0.3, 0.9, 1.2, 1.8):  # Recorded positions 0, 0.4, 0.6, 1.8, 2.4 and 3.6
+        clock.now = 100.0 + elapsed
+        indices.append(backend._next_index())
+
+    # The last frame shows for one mean interval (1 s), so the 3 s period wraps 3.6 back to 0.6
+    assert indices == [0, 0, 1, 1, 2, 1]
+
+
+def test_speed_without_loop_raises_after_the_last_frame(frames, clock):
+    backend = ReplayBackend(frames, speed=1.0, fps=10, loop=False)
+    backend._next_index()
+    clock.now += 0.29
+
+    assert backend._next_index() == 2
+    clock.now += 0.02
+    with pytest.raises(CaptureError, match="exhausted"):
+        backend._next_index()
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from utils.change_detection import ChangeDetector
+
+
+@pytest.fixture
+def frame(textured):
+    return textured(128, 160, channels=3)
+
+
+def test_first_frame_is_entirely_dirty(frame):
+    detector = ChangeDetector(block_size=32, sample=4)
+
+    assert detector.update(frame) == [(0, 0, 160, 128)]
+
+
+def test_unchanged_frame_has_no_dirty_regions(frame):
+    detector = ChangeDetector(block_size=32, sample=4)
+    detector.update(frame)
+
+    assert detector.update(frame.copy()) == []
+
+
+def test_changed_patch_marks_its_blocks(frame):
+    detector = ChangeDetector(block_size=32, sample=4)
+    detector.update(frame)
+    changed = frame.copy()
+    changed[40:56, 70:86] = 255 - changed[40:56, 70:86]
+
+    assert detector.update(changed) == [(64, 32, 32, 32)]
+
+
+def test_versions_only_change_inside_the_dirty_region(frame):
+    detector = ChangeDetector(block_size=32, sample=4)
+    detector.update(frame)
+    inside, outside = (60, 30, 40, 40), (0, 96, 32, 32)
+    before = detector.version(box=inside), detector.version(box=outside), detector.version()
+
+    changed = frame.copy()
+    changed[40:56, 70:86] = 0
+    detector.update(changed)
+
+    assert detector.version(box=inside) != before[0]
+    assert detector.version(box=outside) == before[1]
+    assert detector.version() != before[2]
+
+
+def test_streams_and_resize_are_tracked_separately(frame):
+    detector = ChangeDetector(block_size=32, sample=4)
+    detector.update(frame, key='window')
+    detector.update(frame[:64, :64], key='inventory')
+
+    assert detector.update(frame, key='window') == []
+    assert detector.update(frame[:96, :96], key='inventory') == [(0, 0, 96, 96)]
+
+
+def test_gradual_drift_is_detected_once_it_adds_up(frame):
+    detector = ChangeDetector(block_size=32, sample=4, threshold=3.0)
+    base = frame // 2 + 32  # Leave headroom so the drift is not clipped
+    detector.update(base)
+
+    dirty_frames = 0
+    for step in range(1, 41):
+        drifted = base.copy()
+        drifted[32:64, 64:96] += 2 * step  # 80 levels over 40 frames, under the threshold frame to frame
+        regions = detector.update(drifted)
+        assert regions in ([], [(64, 32, 32, 32)])
+        dirty_frames += bool(regions)
+
+    assert dirty_frames >= 20
+    assert detector.update(drifted) == []
+
+
+def test_reference_only_moves_for_dirty_blocks(frame):
+    detector = ChangeDetector(block_size=32, sample=4, threshold=3.0)
+    base = frame // 2 + 32
+    detector.update(base)
+
+    assert detector.update(base + 2) == []
+    assert len(detector.update(base + 4)) == 20  # Every block of the 160x128 frame
+    assert detector.update(base + 5) == []
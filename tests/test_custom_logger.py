@@ -0,0 +1,59 @@
+import logging
+
+import pytest
+
+from utils.custom_logger import log_every_n, log_rate_limited
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def logger(request):
+    logger = logging.getLogger(f'tests.{request.node.name}')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    yield logger
+    logger.removeHandler(handler)
+
+
+def messages(logger):
+    return [record.getMessage() for record in logger.handlers[0].records]
+
+
+def test_log_every_n_logs_first_and_every_nth_call(logger):
+    for frame in range(7):
+        log_every_n(logger, logging.INFO, 3, "Frame %d", frame)
+
+    assert messages(logger) == ["Frame 0", "Frame 3", "Frame 6"]
+    assert logger.handlers[0].records[0].funcName == 'test_log_every_n_logs_first_and_every_nth_call'
+
+
+def test_log_every_n_counts_call_sites_separately(logger):
+    for frame in range(2):
+        log_every_n(logger, logging.INFO, 2, "First %d", frame)
+        log_every_n(logger, logging.INFO, 2, "Second %d", frame)
+
+    assert messages(logger) == ["First 0", "Second 0"]
+
+
+def test_disabled_level_is_not_counted(logger):
+    log_every_n(logger, logging.DEBUG, 2, "Hidden", key='shared')
+    log_every_n(logger, logging.INFO, 2, "Shown", key='shared')
+
+    assert messages(logger) == ["Shown"]
+
+
+def test_log_rate_limited_skips_calls_within_the_interval(logger):
+    for frame in range(3):
+        log_rate_limited(logger, logging.INFO, 60.0, "Frame %d", frame)
+
+    assert messages(logger) == ["Frame 0"]
@@ -0,0 +1,48 @@
+import threading
+
+import numpy as np
+
+from utils.debug_sink import DebugSink
+
+
+def test_sampling_keeps_every_nth_success_and_all_failures(tmp_path):
+    sink = DebugSink(tmp_path, every_n=3)
+
+    assert [sink.should_record(iteration) for iteration in range(5)] == [True, False, False, True, False]
+    assert sink.should_record(1, failure=True)
+    assert sink.should_record(None)
+
+    sink.failures_only = True
+    assert not sink.should_record(3)
+    assert sink.should_record(4, failure=True)
+
+
+def test_artifacts_are_written_on_close(tmp_path, textured):
+    sink = DebugSink(tmp_path, every_n=2)
+
+    assert sink.save_image(textured(8, 8, channels=3), 'kept.png', iteration=2)
+    assert not sink.save_image(textured(8, 8, channels=3), 'sampled_out.png', iteration=3)
+    assert sink.save_text("Not found", 'miss.txt', iteration=3, failure=True)
+    sink.close()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['kept.png', 'miss.txt']
+    assert sink.written == 2
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    sink = DebugSink(tmp_path, max_queue=2)
+    started, release = threading.Event(), threading.Event()
+    image = np.zeros((4, 4), dtype=np.uint8)
+
+    def block(img):
+        started.set()
+        release.wait(5)
+
+    assert sink.save_image(image, 'busy.png', annotate=block)
+    started.wait(5)  # The writer now holds the first image
+    results = [sink.save_image(image, f'{index}.png') for index in range(4)]
+    release.set()
+    sink.close()
+
+    assert results == [True, True, False, False]
+    assert (sink.written, sink.dropped) == (3, 2)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils import image_loader
+from utils.image_loader import ImageLoader
+
+
+def content_box(array):
+    """(left, top, right, bottom) of the non-black pixels."""
+    rows = np.flatnonzero(array.reshape(array.shape[0], -1).any(axis=1))
+    cols = np.flatnonzero(array.reshape(array.shape[0], array.shape[1], -1).any(axis=(0, 2)))
+    return cols[0], rows[0], cols[-1] + 1, rows[-1] + 1
+
+
+@pytest.fixture
+def frame(textured):
+    return textured(100, 200, channels=3) // 2 + 64  # No black pixels, so the borders are easy to find
+
+
+@pytest.mark.parametrize('resample', ['nearest', 'bilinear'])
+def test_geometry_matches_preprocess_image(frame, resample):
+    loader = ImageLoader(target_size=(128, 96))
+
+    array, scale = loader.preprocess_array(frame, resample=resample)
+    image, expected_scale = loader._preprocess_image(Image.fromarray(frame))
+
+    assert array.shape == (96, 128, 3)
+    assert scale == expected_scale == (0.64, 0.64)
+    assert content_box(array) == content_box(np.asarray(image)) == (0, 16, 128, 80)
+
+
+def test_frame_of_target_size_is_returned_as_is(frame):
+    loader = ImageLoader(target_size=(200, 100))
+
+    array, scale = loader.preprocess_array(frame)
+
+    assert array is frame
+    assert scale == (1.0, 1.0)
+
+
+def test_borders_are_cleared_when_the_geometry_changes(frame):
+    loader = ImageLoader(target_size=(128, 96))
+    loader.preprocess_array(frame)
+
+    array, _ = loader.preprocess_array(np.ascontiguousarray(frame.transpose(1, 0, 2)))
+
+    assert content_box(array) == (40, 0, 88, 96)
+    assert not array[:, :40].any() and not array[:, 88:].any()
+
+
+@pytest.mark.parametrize('opencv', [True, False])
+def test_nearest_takes_the_same_pixels_with_and_without_opencv(monkeypatch, frame, opencv):
+    if not opencv:
+        monkeypatch.setattr(image_loader, 'cv2', None)
+    elif image_loader.cv2 is None:
+        pytest.skip("OpenCV is not installed")
+    loader = ImageLoader(target_size=(100, 50))
+
+    array, scale = loader.preprocess_array(frame, resample='nearest')
+
+    assert scale == (0.5, 0.5)
+    np.testing.assert_array_equal(array, frame[::2, ::2])
+
+
+def test_unknown_resample_is_rejected(frame):
+    with pytest.raises(ValueError, match="Unknown resample method"):
+        ImageLoader().preprocess_array(frame, resample='cubic')
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from utils.inventory import INVENTORY_COLUMNS, INVENTORY_ROWS, SLOT_SIZE, InventoryReader
+
+SLOT_WIDTH, SLOT_HEIGHT = SLOT_SIZE
+
+
+def sprite(textured):
+    """A slot-sized RGBA item whose 4 pixel border is transparent, so it is not rescaled when fitted."""
+    gray = textured(SLOT_HEIGHT, SLOT_WIDTH, cell=3)
+    rgba = np.dstack([gray, gray, gray, np.full(gray.shape, 255, dtype=np.uint8)])
+    rgba[:4, :, 3] = rgba[-4:, :, 3] = rgba[:, :4, 3] = rgba[:, -4:, 3] = 0
+    return rgba
+
+
+@pytest.fixture
+def items(textured):
+    return {'rune': sprite(textured), 'coins': sprite(textured)}
+
+
+def grid_with(slots, rng, textured):
+    """Inventory grid image with the given {slot: rgba} items on a flat background."""
+    grid = np.full((INVENTORY_ROWS * SLOT_HEIGHT, INVENTORY_COLUMNS * SLOT_WIDTH), 40, dtype=np.uint8)
+    for slot, rgba in slots.items():
+        row, column = divmod(slot, INVENTORY_COLUMNS)
+        cell = grid[row * SLOT_HEIGHT:(row + 1) * SLOT_HEIGHT, column * SLOT_WIDTH:(column + 1) * SLOT_WIDTH]
+        if rgba is None:
+            cell[:] = textured(SLOT_HEIGHT, SLOT_WIDTH)  # Something that is not one of the items
+            continue
+        opaque = rgba[..., 3] > 0
+        cell[opaque] = rgba[..., 0][opaque]
+        cell[~opaque] = rng.integers(0, 256, int((~opaque).sum()))  # Slot background, hidden by the mask
+    return grid
+
+
+def test_classify_assigns_items_to_their_slots(rng, textured, items):
+    reader = InventoryReader(None, items)
+    grid = grid_with({0: items['rune'], 5: items['rune'], 10: items['coins'], 27: None}, rng, textured)
+
+    slots = reader.classify(grid)
+
+    assert len(slots) == INVENTORY_ROWS * INVENTORY_COLUMNS
+    assert {slot: name for slot, name in slots.items() if name} == {0: 'rune', 5: 'rune', 10: 'coins'}
+
+
+def test_scores_are_one_for_exact_items_and_zero_for_empty_slots(rng, textured, items):
+    reader = InventoryReader(None, items)
+    grid = grid_with({3: items['coins']}, rng, textured)
+
+    scores = reader.scores(grid)
+
+    assert scores.shape == (INVENTORY_ROWS * INVENTORY_COLUMNS, 2)
+    assert scores[3, 1] == pytest.approx(1.0)
+    assert not scores[4:].any()
+
+
+def test_color_grid_larger_than_the_slots_is_cropped(rng, textured, items):
+    reader = InventoryReader(None, items)
+    grid = grid_with({12: items['rune']}, rng, textured)
+    color = np.pad(np.dstack([grid] * 3), ((0, 5), (0, 7), (0, 0)))
+
+    assert reader.classify(color)[12] == 'rune'
+    with pytest.raises(ValueError, match="smaller than"):
+        reader.classify(grid[:-1])
@@ -0,0 +1,37 @@
+from utils.overlay_markup import DEFAULT_COLOR, Cell, parse_markup
+
+
+def test_spans_and_plain_text_take_consecutive_columns():
+    cells = parse_markup("<color=lightgreen>Alchs:</color> <color=lightblue>1.50/s</color> done")
+
+    assert cells == (
+        Cell(0, 0, "Alchs:", "lightgreen", 16),
+        Cell(0, 1, " ", DEFAULT_COLOR, 16),
+        Cell(0, 2, "1.50/s", "lightblue", 16),
+        Cell(0, 3, " done", DEFAULT_COLOR, 16),
+    )
+
+
+def test_newlines_start_rows_and_empty_runs_are_skipped():
+    cells = parse_markup("<size=20>Title</size>\n\nplain <color=red></color><color=red>x</color>\n",
+                         default_font_size=12)
+
+    assert cells == (
+        Cell(0, 0, "Title", DEFAULT_COLOR, 20),
+        Cell(2, 0, "plain ", DEFAULT_COLOR, 12),
+        Cell(2, 1, "x", "red", 12),
+    )
+
+
+def test_changed_values_keep_the_same_cells():
+    template = "<color=green>Total:</color> <color=blue>{}</color>\n<color=green>Rate:</color> {}"
+
+    before = parse_markup(template.format(1, "1.0/s"))
+    after = parse_markup(template.format(12345, "99.9/s"))
+
+    assert [(c.row, c.column, c.color) for c in before] == [(c.row, c.column, c.color) for c in after]
+    assert after[2].text == "12345"
+
+
+def test_unclosed_tags_are_plain_text():
+    assert parse_markup("<color=red>open") == (Cell(0, 0, "<color=red>open", DEFAULT_COLOR, 16),)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.overlay_renderer import OverlayRenderer
+from utils.screen_capture import Frame
+
+TEXT = "<color=lightgreen>Alchs:</color> <color=yellow>1.23/s</color>\n<color=red>Miss</color>"
+
+
+@pytest.fixture
+def frame(textured):
+    return textured(120, 200, channels=3)
+
+
+def reference(frame, text, position, renderer):
+    """The overlay composited by PIL, as an RGB array."""
+    image = Image.fromarray(frame).convert('RGBA')
+    image.alpha_composite(renderer.render(text), position)
+    return np.asarray(image.convert('RGB')).astype(int)
+
+
+def test_array_composite_matches_pil(frame):
+    renderer = OverlayRenderer(font_size=12)
+
+    result = renderer.composite(frame, TEXT, position=(7, 9))
+
+    assert np.abs(result.astype(int) - reference(frame, TEXT, (7, 9), renderer)).max() <= 1
+    assert not np.array_equal(result, frame)
+
+
+def test_frames_are_copied_unless_inplace(frame):
+    renderer = OverlayRenderer(font_size=12)
+    original = frame.copy()
+
+    renderer.composite(frame, TEXT)
+    assert np.array_equal(frame, original)
+
+    result = renderer.composite(frame, TEXT, inplace=True)
+    assert result is frame and not np.array_equal(frame, original)
+
+
+def test_bgra_frame_is_blended_in_its_own_channel_order(frame):
+    renderer = OverlayRenderer(font_size=12)
+    bgra = np.dstack([frame[..., ::-1], np.full(frame.shape[:2], 255, dtype=np.uint8)])
+
+    result = renderer.composite(Frame(bgra, 0.0, 1, 0, 0, 'BGRA'), TEXT, position=(3, 4))
+
+    assert (result.image[..., 3] == 255).all()
+    expected = reference(frame, TEXT, (3, 4), renderer)
+    assert np.abs(result.image[..., 2::-1].astype(int) - expected).max() <= 1
+
+
+@pytest.mark.parametrize('position', [(-30, -10), (150, 90), (500, 500)])
+def test_overlay_is_clipped_to_the_frame(frame, position):
+    renderer = OverlayRenderer(font_size=12)
+
+    result = renderer.composite(frame, TEXT, position=position)
+
+    expected = reference(frame, TEXT, position, renderer)
+    assert np.abs(result.astype(int) - expected).max() <= 1
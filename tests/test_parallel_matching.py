@@ -0,0 +1,34 @@
+import asyncio
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.parallel_matching import ParallelMatcher
+from utils.template_matching import Box, PreparedTemplate, locate
+
+
+@pytest.fixture
+def scene(textured):
+    frame = textured(80, 120, cell=1)
+    sprite = frame[30:46, 50:70].copy()
+    sprite[:, :5] = 255 - sprite[:, :5]  # Hidden by the alpha mask
+    rgba = np.dstack([np.repeat(sprite[..., None], 3, axis=2), np.full(sprite.shape, 255, dtype=np.uint8)])
+    rgba[:, :5, 3] = 0
+    return frame, PreparedTemplate(Image.fromarray(rgba, 'RGBA'))
+
+
+def test_workers_keep_the_alpha_mask(scene):
+    frame, template = scene
+    assert locate(template, frame, confidence=0.95) == Box(50, 30, 20, 16)
+
+    with ParallelMatcher({'sprite': template}, workers=1) as matcher:
+        assert asyncio.run(matcher.locate('sprite', frame, confidence=0.95)) == Box(50, 30, 20, 16)
+
+
+def test_worker_errors_are_not_hidden_by_the_shared_buffer(scene):
+    frame, template = scene
+
+    with ParallelMatcher({'sprite': template}, workers=1, method='unknown') as matcher:
+        with pytest.raises(ValueError, match="Unknown matching method"):
+            asyncio.run(matcher.locate('sprite', frame))
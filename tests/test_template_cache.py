@@ -0,0 +1,38 @@
+import numpy as np
+from PIL import Image
+
+from utils.template_cache import TemplateCache
+
+
+def save_sprite(path, textured, transparent=False):
+    rgba = np.dstack([textured(12, 16, channels=3), np.full((12, 16), 255, dtype=np.uint8)])
+    if transparent:
+        rgba[:, :3, 3] = 0
+    Image.fromarray(rgba, 'RGBA').save(path)
+    return path
+
+
+def test_entries_are_reused_by_content(tmp_path, textured):
+    cache = TemplateCache()
+    path = save_sprite(tmp_path / 'sprite.png', textured)
+    copy = tmp_path / 'copy.png'
+    copy.write_bytes(path.read_bytes())
+
+    assert cache.get(path) is cache.get(copy)
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_disk_store_keeps_the_mask_but_no_spectra(tmp_path, textured):
+    path = save_sprite(tmp_path / 'sprite.png', textured, transparent=True)
+    first = TemplateCache(cache_dir=tmp_path / 'store').get(path)
+
+    restarted = TemplateCache(cache_dir=tmp_path / 'store')
+    template = restarted.get(path)
+
+    assert restarted.disk_hits == 1
+    np.testing.assert_array_equal(template.array, first.array)
+    np.testing.assert_array_equal(template.mask, first.mask)
+    assert template.spectra == {}
+    (entry,) = (tmp_path / 'store').glob('*.npz')
+    with np.load(entry) as data:
+        assert sorted(data.files) == ['array', 'mask']
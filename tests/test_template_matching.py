@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.template_matching import (Box, PreparedFrame, PreparedTemplate, locate, locate_all, match_template,
+                                     non_max_suppression, to_array)
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+requires_cv2 = pytest.mark.skipif(cv2 is None, reason="OpenCV is needed as the reference implementation")
+
+ENGINES = ('fft', 'direct') + (('opencv',) if cv2 is not None else ())
+
+
+def reference_scores(frame, template, grayscale, mask=None):
+    """TM_CCOEFF_NORMED straight from OpenCV on the arrays the matchers use."""
+    image = to_array(frame, grayscale).astype(np.float32)
+    templ = to_array(template, grayscale).astype(np.float32)
+    if mask is None:
+        return cv2.matchTemplate(image, templ, cv2.TM_CCOEFF_NORMED)
+    return cv2.matchTemplate(image, templ, cv2.TM_CCOEFF_NORMED, mask=mask.astype(np.uint8))
+
+
+@requires_cv2
+@pytest.mark.parametrize('method', ENGINES)
+@pytest.mark.parametrize('grayscale', [True, False])
+def test_engines_match_opencv(textured, method, grayscale):
+    frame = textured(60, 80, channels=3, cell=1)
+    template = frame[12:30, 25:49].copy()
+
+    scores = match_template(frame, template, method=method, grayscale=grayscale)
+
+    expected = reference_scores(frame, template, grayscale)
+    assert scores.shape == expected.shape
+    np.testing.assert_allclose(scores, expected, atol=1e-4)
+    assert np.unravel_index(scores.argmax(), scores.shape) == (12, 25)
+
+
+@requires_cv2
+@pytest.mark.parametrize('method', ENGINES)
+@pytest.mark.parametrize('grayscale', [True, False])
+def test_masked_engines_match_opencv(rng, textured, method, grayscale):
+    frame = textured(60, 80, channels=3, cell=1)
+    mask = rng.random((15, 20)) > 0.3
+    rgba = np.dstack([frame[10:25, 20:40], np.where(mask, 255, 0).astype(np.uint8)])
+    template = PreparedTemplate(Image.fromarray(rgba, 'RGBA'), grayscale)
+    assert template.mask is not None
+
+    scores = match_template(PreparedFrame(frame, grayscale), template, method=method)
+
+    expected = reference_scores(frame, template.array, grayscale, mask)
+    np.testing.assert_allclose(scores, expected, atol=1e-4)
+
+
+def test_mask_ignores_transparent_pixels(textured):
+    frame = textured(60, 80, cell=1)
+    sprite = frame[20:36, 30:46].copy()
+    sprite[:, :4] = 255 - sprite[:, :4]  # Garbage that the mask hides
+    rgba = np.dstack([np.repeat(sprite[..., None], 3, axis=2), np.full(sprite.shape, 255, dtype=np.uint8)])
+    rgba[:, :4, 3] = 0
+
+    masked = PreparedTemplate(Image.fromarray(rgba, 'RGBA'))
+    opaque = PreparedTemplate(Image.fromarray(rgba[..., :3]))
+
+    for method in ENGINES:
+        assert locate(masked, frame, confidence=0.99, method=method) == Box(30, 20, 16, 16)
+        assert locate(opaque, frame, confidence=0.99, method=method) is None
+
+
+# The direct engine is too slow for a full-size frame
+@pytest.mark.parametrize('method', [method for method in ENGINES if method != 'direct'])
+def test_pyramid_finds_planted_target(textured, method):
+    frame = textured(240, 320)
+    target = textured(40, 56)
+    frame[150:190, 37:93] = target
+
+    assert locate(target, frame, confidence=0.9, method=method, levels=3) == Box(37, 150, 56, 40)
+    assert locate(target, frame, confidence=0.9, method=method, levels=1) == Box(37, 150, 56, 40)
+
+
+def test_locate_all_deduplicates_overlapping_peaks(textured):
+    frame = textured(120, 160, cell=2)
+    sprite = textured(16, 16, cell=2)
+    positions = [(10, 5), (70, 40), (120, 90)]
+    for x, y in positions:
+        frame[y:y + 16, x:x + 16] = sprite
+
+    boxes, scores = locate_all(sprite, frame, confidence=0.5, method='fft')
+
+    assert sorted(map(tuple, boxes[:, :2])) == positions
+    assert (boxes[:, 2:] == 16).all()
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_non_max_suppression_keeps_best_of_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [50, 50, 10, 10], [2, 0, 10, 10]])
+    scores = np.array([0.8, 0.95, 0.7, 0.6])
+
+    assert non_max_suppression(boxes, scores, overlap=0.3).tolist() == [1, 2]
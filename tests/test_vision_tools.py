@@ -0,0 +1,92 @@
+import asyncio
+
+import numpy as np
+
+from utils.change_detection import ChangeDetector
+from utils.screen_capture import Frame
+from utils.template_matching import Box
+from utils.vision_tools import LocateCache, wait_for_template
+
+
+class CountingSearch:
+    """Stand-in for locate_on_screen that records its calls and returns a fixed result."""
+
+    def __init__(self, result=None):
+        self.calls = 0
+        self.result = result
+
+    def __call__(self, image, screen, **kwargs):
+        self.calls += 1
+        return self.result
+
+
+class BackgroundCapture:
+    """Stand-in for a ScreenCapture whose background thread serves one frame of a window at (100, 50)."""
+
+    background_running = True
+
+    def __init__(self, image):
+        self.frame = Frame(image, 0.0, 1, 100, 50, 'L')
+
+    async def next_frame(self, after_seq, timeout=None):
+        if after_seq >= self.frame.sequence:
+            raise asyncio.TimeoutError
+        return self.frame
+
+    def get_roi_bounds(self, name):
+        return {"left": 120, "top": 60, "width": 80, "height": 60}
+
+
+def test_unchanged_screen_reuses_the_result(textured):
+    search = CountingSearch(Box(1, 2, 3, 4))
+    cache = LocateCache(ChangeDetector(), search=search)
+    template, screen = textured(8, 8), textured(64, 64)
+
+    results = [cache.locate(template, screen) for _ in range(3)]
+
+    assert results == [Box(1, 2, 3, 4)] * 3
+    assert (search.calls, cache.hits, cache.misses) == (1, 2, 1)
+
+
+def test_reused_buffer_changed_in_place_is_searched_again(textured):
+    search = CountingSearch()
+    cache = LocateCache(ChangeDetector(), search=search)
+    template, buffer = textured(8, 8), textured(64, 64)
+
+    assert cache.locate(template, buffer) is None
+    buffer[:16, :16] = 255 - buffer[:16, :16]  # Same array object, new content
+    search.result = Box(0, 0, 8, 8)
+
+    assert cache.locate(template, buffer) == Box(0, 0, 8, 8)
+    assert search.calls == 2
+    assert cache.last_dirty_regions == [(0, 0, 32, 32)]
+
+
+def test_results_are_cached_per_template_and_cleared(textured):
+    search = CountingSearch()
+    cache = LocateCache(ChangeDetector(), search=search)
+    first, second, screen = textured(8, 8), textured(8, 8), textured(64, 64)
+
+    cache.locate(first, screen)
+    cache.locate(second, screen)
+    cache.locate(first, screen)
+    assert search.calls == 2
+
+    cache.clear()
+    cache.locate(first, screen)
+    assert search.calls == 3
+    assert np.array_equal(cache.last_dirty_regions, [(0, 0, 64, 64)])
+
+
+def test_searched_frame_gives_the_screen_position_of_matches(textured):
+    image = textured(120, 160)
+    capture = BackgroundCapture(image)
+    template = image[30:46, 50:70].copy()  # At (30, 20) inside the ROI
+
+    location, searched = asyncio.run(wait_for_template(template, capture, timeout=0, roi='inventory',
+                                                       confidence=0.95, with_frame=True))
+
+    assert location == Box(30, 20, 20, 16)
+    assert (searched.left + location.left, searched.top + location.top) == (150, 80)
+    np.testing.assert_array_equal(searched.image, image[10:70, 20:100])
+    assert not np.shares_memory(searched.image, image)
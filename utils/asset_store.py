@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Tuple, Union
+
+import numpy as np
+
+from utils.custom_logger import setup_logging
+
+logger_manager = setup_logging(log_to_file=True)
+logger = logger_manager.get_logger(__name__)
+
+INDEX_FILE = 'index.json'
+
+# Asset names usable as file names as they are; other names (e.g. relative paths) get a sanitized, hashed file name.
+_SAFE_NAME = re.compile(r'[\w.-]+')
+_UNSAFE_CHARS = re.compile(r'[^\w.-]')
+
+# Loader used by the worker processes of PreprocessedAssetStore.iter_update, built once per worker.
+_worker_loader = None
+
+
+def file_hash(path) -> str:
+    """SHA-1 of a file's contents, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _loader_settings(loader) -> dict:
+    target_size = list(loader.target_size) if loader.target_size else None
+    return {'color_mode': loader.color_mode, 'target_size': target_size}
+
+
+def _file_stem(name: str) -> str:
+    """File name stem of an asset: the name itself, or a sanitized name plus a hash if it has e.g. path separators."""
+    if _SAFE_NAME.fullmatch(name):
+        return name
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:12]
+    return f"{_UNSAFE_CHARS.sub('_', name)}-{digest}"
+
+
+def _store_asset(loader, store_dir: Path, name: str, source) -> dict:
+    """Preprocess `source` with `loader`, save it as `<name>.npy` in `store_dir` and return its index entry."""
+    stat = os.stat(source)
+    source_hash = file_hash(source)
+    image, scale = loader.load_image(source)
+    array = np.asarray(image)
+    file_name = f"{_file_stem(name)}.npy"
+    # Unique per writer, so concurrent workers never share a temporary file
+    temp_path = store_dir / f"{_file_stem(name)}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp.npy"
+    np.save(temp_path, array)
+    os.replace(temp_path, store_dir / file_name)
+
+    return {
+        'file': file_name,
+        'source': str(source),
+        'source_hash': source_hash,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_size': stat.st_size,
+        'scale': list(scale),
+        'shape': list(array.shape),
+        'dtype': array.dtype.str,
+        **_loader_settings(loader),
+    }
+
+
+def _init_worker(loader_class, target_size, color_mode) -> None:
+    global _worker_loader
+    _worker_loader = loader_class(target_size=target_size, color_mode=color_mode)
+
+
+def _store_asset_in_worker(store_dir: str, name: str, source: str) -> dict:
+    return _store_asset(_worker_loader, Path(store_dir), name, source)
+
+
+class PreprocessedAssetStore:
+    """
+    On-disk store of preprocessed images as memory-mappable .npy arrays.
+
+    Every asset is preprocessed once with an ImageLoader and saved as `<name>.npy` in `store_dir`, next to
+    an index.json recording its source path, source hash, scale factors, color mode and target size.
+    `update` only reprocesses assets whose source content or loader settings changed (files whose
+    modification time and size are unchanged are not even re-hashed), and `load` maps the stored arrays
+    without decoding anything.
+
+    Parameters:
+    - loader (ImageLoader): Loader defining the preprocessing (target size and color mode).
+    - store_dir (str): Directory holding the arrays and the index.
+    """
+
+    def __init__(self, loader, store_dir):
+        self.loader = loader
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.store_dir / INDEX_FILE
+        self.index: Dict[str, dict] = {}
+        self.last_stats: Dict[str, float] = {}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path) as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable asset index {self.index_path}: {e}")
+
+    def is_current(self, name: str, source) -> bool:
+        """Whether the stored array of `name` was made from the current content of `source` with these settings."""
+        entry = self.index.get(name)
+        if not entry or not (self.store_dir / entry['file']).exists():
+            return False
+        if any(entry.get(key) != value for key, value in _loader_settings(self.loader).items()):
+            return False
+        stat = os.stat(source)
+        if entry.get('source_mtime_ns') == stat.st_mtime_ns and entry.get('source_size') == stat.st_size:
+            return True
+        if entry['source_hash'] != file_hash(source):
+            return False
+        # Same content with a new timestamp, e.g. after a checkout: remember it so it is not hashed again
+        entry['source_mtime_ns'], entry['source_size'] = stat.st_mtime_ns, stat.st_size
+        return True
+
+    def process(self, name: str, source) -> dict:
+        """Preprocess `source`, store its array under `name` and return the index entry."""
+        entry = _store_asset(self.loader, self.store_dir, name, source)
+        self.index[name] = entry
+        return entry
+
+    def update(self, sources: Dict[str, str]) -> Dict[str, dict]:
+        """
+        Bring the store up to date with `sources` (name -> image path), reprocessing only changed assets.
+        Assets that fail to process are logged and skipped. Returns the index entries of `sources`.
+        """
+        processed = failed = 0
+        for name, source in sources.items():
+            try:
+                if not self.is_current(name, source):
+                    self.process(name, source)
+                    processed += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to process asset {name} ({source}): {e}")
+        self.save_index()
+        logger.info(f"Asset store {self.store_dir}: {processed} processed, {failed} failed, "
+                    f"{len(sources) - processed - failed} up to date")
+        return {name: self.index[name] for name in sources if name in self.index}
+
+    def iter_update(self, sources: Union[Dict[str, str], Iterable[Tuple[str, str]]], workers: int = None,
+                    max_pending: int = None) -> Iterator[Tuple[str, dict]]:
+        """
+        Parallel, streaming version of `update` for large batches such as recorded sessions.
+
+        `sources` is a name -> path dict or any iterable of (name, path) pairs, consumed lazily. Changed
+        assets are preprocessed on a pool of `workers` processes (default: CPU count) with at most
+        `max_pending` (default: twice the workers) in flight, so memory stays bounded however many files
+        there are. Yields (name, index entry) as each asset completes, up-to-date ones included. Files
+        that fail are logged and skipped, and so is any source whose name was already used in this batch,
+        so two files can never overwrite each other's entry. Throughput is logged at the end and kept in `last_stats`.
+        """
+        workers = workers or os.cpu_count() or 1
+        max_pending = max_pending or 2 * workers
+        items = iter(sources.items() if isinstance(sources, dict) else sources)
+        stats = {'processed': 0, 'up_to_date': 0, 'failed': 0, 'bytes': 0}
+        start = time.perf_counter()
+        pending = {}
+        seen = {}  # Name -> source of every asset dispatched or found up to date in this batch
+        initargs = (type(self.loader), self.loader.target_size, self.loader.color_mode)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+                exhausted = False
+                while True:
+                    while not exhausted and len(pending) < max_pending:
+                        try:
+                            name, source = next(items)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        if name in seen:
+                            stats['failed'] += 1
+                            logger.error(f"Skipping {source}: asset name '{name}' is already used by {seen[name]}")
+                            continue
+                        seen[name] = source
+                        try:
+                            current = self.is_current(name, source)
+                        except OSError as e:
+                            stats['failed'] += 1
+                            logger.error(f"Failed to process asset {name} ({source}): {e}")
+                            continue
+                        if current:
+                            stats['up_to_date'] += 1
+                            yield name, self.index[name]
+                            continue
+                        future = pool.submit(_store_asset_in_worker, str(self.store_dir), name, str(source))
+                        pending[future] = (name, source)
+                    if not pending:
+                        break
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name, source = pending.pop(future)
+                        try:
+                            entry = future.result()
+                        except Exception as e:
+                            stats['failed'] += 1
+                            logger.error(f"Failed to process asset {name} ({source}): {e}")
+                            continue
+                        self.index[name] = entry
+                        stats['processed'] += 1
+                        stats['bytes'] += entry['source_size']
+                        yield name, entry
+        finally:
+            self.save_index()
+            elapsed = time.perf_counter() - start
+            stats['seconds'] = elapsed
+            stats['images_per_second'] = stats['processed'] / elapsed if elapsed > 0 else 0.0
+            stats['mb_per_second'] = stats['bytes'] / 1e6 / elapsed if elapsed > 0 else 0.0
+            self.last_stats = stats
+            logger.info(f"Asset store {self.store_dir}: {stats['processed']} processed, {stats['failed']} failed, "
+                        f"{stats['up_to_date']} up to date in {elapsed:.1f}s "
+                        f"({stats['images_per_second']:.1f} images/s, {stats['mb_per_second']:.1f} MB/s read)")
+
+    def save_index(self) -> None:
+        temp_path = self.index_path.with_suffix('.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def load(self, name: str, mmap: bool = True) -> Tuple[np.ndarray, Tuple[float, float]]:
+        """Return the stored array of `name` (read-only memory map by default) and its scale factors."""
+        entry = self.index.get(name)
+        if entry is None:
+            raise KeyError(f"Asset '{name}' is not in the store {self.store_dir}.")
+        array = np.load(self.store_dir / entry['file'], mmap_mode='r' if mmap else None)
+        return array, tuple(entry['scale'])
+
+    def load_all(self, mmap: bool = True) -> Dict[str, Tuple[np.ndarray, Tuple[float, float]]]:
+        """Map every stored asset. Returns a dict of (array, scale) keyed by name."""
+        return {name: self.load(name, mmap) for name in self.index}
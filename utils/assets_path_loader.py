@@ -1,5 +1,11 @@
+import os
+from collections import OrderedDict
 from pathlib import Path
 
+from PIL import Image
+
+from utils.asset_store import file_hash
+
 ASSETS_ROOT = Path(__file__).parent / "../assets"
 
 
@@ -32,6 +38,116 @@ def load_assets(path=ASSETS_ROOT):
     return assets
 
 
+def _image_bytes(value):
+    """Approximate memory footprint of a cached value: PIL images, arrays, or anything with `nbytes`."""
+    if isinstance(value, tuple):
+        return sum(_image_bytes(item) for item in value)
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    return getattr(value, 'nbytes', 0)
+
+
+class AssetRegistry:
+    """
+    Lazy, cached replacement for load_assets.
+
+    A category directory is only listed when it is first used, and listed again when its modification time
+    changes (a file was added or removed). Images are decoded on first access, optionally preprocessed by an
+    ImageLoader, and kept in an LRU bounded by `max_bytes` of decoded pixels and `max_entries` entries. Every
+    access checks the file's mtime and size; when they changed, the file is hashed and the entry is decoded
+    again only if its content differs.
+
+    Parameters:
+    - root (Path): Assets root directory. Default is ASSETS_ROOT.
+    - max_bytes (int): Memory budget of the decoded image cache. Default is 256 MB.
+    - max_entries (int): Maximum number of cached images, or None (default) for no limit.
+    """
+
+    def __init__(self, root=ASSETS_ROOT, max_bytes=256 * 1024 * 1024, max_entries=None):
+        self.root = Path(root)
+        if not self.root.is_dir():
+            raise NotADirectoryError(f"The specified assets root is not a directory: {self.root}")
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.cached_bytes = 0
+        self._index = {}
+        self._cache = OrderedDict()
+
+    def categories(self):
+        return sorted(entry.name for entry in os.scandir(self.root) if entry.is_dir())
+
+    def paths(self, category):
+        """Return the name -> absolute path mapping of a category, like load_assets()[category]."""
+        directory = self.root / category
+        mtime = os.stat(directory).st_mtime_ns
+        indexed = self._index.get(category)
+        if indexed is None or indexed[0] != mtime:
+            files = {Path(entry.name).stem: os.path.abspath(entry.path) for entry in os.scandir(directory)
+                     if entry.is_file() and '.' in entry.name}
+            indexed = self._index[category] = (mtime, files)
+        return indexed[1]
+
+    def path(self, category, name):
+        paths = self.paths(category)
+        if name not in paths:
+            raise KeyError(f"No asset '{name}' in category '{category}'. Available: {sorted(paths)}")
+        return paths[name]
+
+    def __getitem__(self, category):
+        return self.paths(category)
+
+    def load(self, category, name, loader=None):
+        """
+        Return the decoded image of an asset, preprocessed with `loader` (as `loader.load_image` does,
+        i.e. an (image, scale) tuple) if given. Cached images must not be modified by the caller.
+        """
+        path = self.path(category, name)
+        key = (path, None if loader is None else (tuple(loader.target_size or ()), loader.color_mode))
+        stat = os.stat(path)
+        entry = self._cache.get(key)
+        if entry is not None:
+            mtime, size, digest, value = entry
+            if (mtime, size) != (stat.st_mtime_ns, stat.st_size):
+                new_digest = file_hash(path)
+                if new_digest == digest:
+                    entry = self._cache[key] = (stat.st_mtime_ns, stat.st_size, digest, value)
+                else:
+                    self._evict(key)
+                    entry = None
+        if entry is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+        self.misses += 1
+        if loader is not None:
+            value = loader.load_image(path)
+        else:
+            value = Image.open(path)
+            value.load()
+        self._cache[key] = (stat.st_mtime_ns, stat.st_size, file_hash(path), value)
+        self.cached_bytes += _image_bytes(value)
+        self._trim()
+        return value
+
+    def _evict(self, key):
+        entry = self._cache.pop(key)
+        self.cached_bytes -= _image_bytes(entry[3])
+
+    def _trim(self):
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while len(self._cache) > 1 and (self.cached_bytes > self.max_bytes or
+                                        (self.max_entries and len(self._cache) > self.max_entries)):
+            self._evict(next(iter(self._cache)))
+
+    def clear(self):
+        self._cache.clear()
+        self._index.clear()
+        self.cached_bytes = 0
+
+
 # Example usage:
 if __name__ == '__main__':
     try:
@@ -0,0 +1,193 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from utils.custom_logger import setup_logging
+
+logger_manager = setup_logging(log_to_file=False)
+logger = logger_manager.get_logger(__name__)
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.bmp')
+SESSION_MANIFEST = 'session.json'
+
+# Raw BGRA capture result, mirroring the attributes of mss.screenshot.ScreenShot that ScreenCapture uses.
+Shot = namedtuple('Shot', ['raw', 'width', 'height', 'left', 'top'])
+
+# Static window geometry for backends that do not track a real window.
+StaticWindow = namedtuple('StaticWindow', ['title', 'left', 'top', 'right', 'bottom', 'width', 'height'])
+
+
+class CaptureError(Exception):
+    """Raised by a backend when a grab fails, e.g. because the region is off screen."""
+
+
+class CaptureBackend(ABC):
+    """
+    Source of window geometry and BGRA frames for ScreenCapture.
+
+    Backends implement `list_windows`, `find_window` and `grab`. `grab` receives an mss-style monitor
+    dict (screen coordinates) and returns an object with `raw` (BGRA bytes), `width`, `height`, `left`
+    and `top`.
+    """
+
+    @abstractmethod
+    def list_windows(self):
+        ...
+
+    @abstractmethod
+    def find_window(self, app_name):
+        ...
+
+    @abstractmethod
+    def grab(self, monitor):
+        ...
+
+    def for_thread(self):
+        """Return a backend instance that may be used from a new thread. Shared by default."""
+        return self
+
+    def close(self):
+        pass
+
+
+class MssBackend(CaptureBackend):
+    """Live capture of desktop windows through mss and pygetwindow."""
+
+    def __init__(self):
+        # Imported lazily so headless machines can use the other backends
+        import mss
+        import mss.exception
+        import pygetwindow
+
+        self._mss = mss
+        self._gw = pygetwindow
+        self.sct = mss.mss()
+
+    def list_windows(self):
+        return self._gw.getAllTitles()
+
+    def find_window(self, app_name):
+        windows = self._gw.getWindowsWithTitle(app_name)
+        return windows[0] if windows else None
+
+    def grab(self, monitor):
+        try:
+            return self.sct.grab(monitor)
+        except self._mss.exception.ScreenShotError as e:
+            raise CaptureError(str(e)) from e
+
+    def for_thread(self):
+        # mss handles are bound to the thread that created them
+        return MssBackend()
+
+    def close(self):
+        self.sct.close()
+        logger.debug("mss instance closed")
+
+
+class ReplayBackend(CaptureBackend):
+    """
+    Serve frames from disk instead of the screen, for headless and deterministic benchmarking.
+
+    `source` is either a directory of screenshots (e.g. assets/screens), replayed in file name order,
+    or a session recorded with ScreenCapture.record_session, whose manifest stores the original frame
+    timestamps. The replayed "window" sits at the screen origin and has the size of the first frame.
+
+    Parameters:
+    - source (str): Directory containing the frames.
+    - speed (float): Playback speed relative to the recorded timing (or `fps` for plain directories).
+      None (default) advances exactly one frame per grab, as fast as frames are requested.
+    - fps (float): Frame rate assumed for directories without a session manifest. Default is 30.
+    - loop (bool): Restart from the first frame after the last one. Default is True.
+    - preload (bool): Decode every frame up front so grabs only cost a copy. This holds the whole source in
+      memory (about 3.7 MB per 1280x720 frame), so it is off by default and frames are decoded on each grab.
+      Default is False.
+    """
+
+    def __init__(self, source, speed=None, fps=30, loop=True, preload=False):
+        self.source = Path(source)
+        if not self.source.is_dir():
+            raise NotADirectoryError(f"Replay source is not a directory: {self.source}")
+
+        manifest_path = self.source / SESSION_MANIFEST
+        if manifest_path.exists():
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.paths = [self.source / entry['file'] for entry in manifest['frames']]
+            self.timestamps = [entry['timestamp'] for entry in manifest['frames']]
+        else:
+            self.paths = sorted(p for p in self.source.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+            self.timestamps = [index / fps for index in range(len(self.paths))]
+        if not self.paths:
+            raise FileNotFoundError(f"No frames found in {self.source}")
+
+        self.speed = speed
+        self.loop = loop
+        self._frames = [self._decode(path) for path in self.paths] if preload else None
+        self._index = -1
+        self._start = None
+
+        height, width = self._frame(0).shape[:2]
+        self.window = StaticWindow(f"replay:{self.source.name}", 0, 0, width, height, width, height)
+        logger.debug("Replay backend loaded %d frames from %s", len(self.paths), self.source)
+
+    @staticmethod
+    def _decode(path):
+        with Image.open(path) as img:
+            rgb = np.asarray(img.convert('RGB'))
+        bgra = np.empty(rgb.shape[:2] + (4,), dtype=np.uint8)
+        bgra[..., :3] = rgb[..., ::-1]
+        bgra[..., 3] = 255
+        return bgra
+
+    def _frame(self, index):
+        return self._frames[index] if self._frames is not None else self._decode(self.paths[index])
+
+    def _next_index(self):
+        count = len(self.paths)
+        if self.speed is None:
+            index = self._index + 1
+            if index >= count:
+                if not self.loop:
+                    raise CaptureError("Replay source exhausted.")
+                index = 0
+            return index
+
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = now
+        position = (now - self._start) * self.speed
+        duration = self.timestamps[-1] - self.timestamps[0]
+        period = duration + (duration / (count - 1) if count > 1 else 0)  # Last frame shows for one interval
+        if period > 0 and position >= period:
+            if not self.loop:
+                raise CaptureError("Replay source exhausted.")
+            position %= period
+        index = int(np.searchsorted(self.timestamps, self.timestamps[0] + position, side='right')) - 1
+        return min(max(index, 0), count - 1)
+
+    @property
+    def frame_index(self):
+        """Index of the most recently served frame."""
+        return self._index
+
+    def list_windows(self):
+        return [self.window.title]
+
+    def find_window(self, app_name):
+        return self.window
+
+    def grab(self, monitor):
+        self._index = self._next_index()
+        frame = self._frame(self._index)
+        left, top = monitor["left"] - self.window.left, monitor["top"] - self.window.top
+        if left < 0 or top < 0 or left + monitor["width"] > frame.shape[1] or top + monitor["height"] > frame.shape[0]:
+            raise CaptureError(f"Region {monitor} lies outside the {frame.shape[1]}x{frame.shape[0]} replay frame.")
+        # Copy like a real grab would, so consumers may modify the returned pixels
+        crop = frame[top:top + monitor["height"], left:left + monitor["width"]].copy()
+        return Shot(crop, monitor["width"], monitor["height"], monitor["left"], monitor["top"])
@@ -0,0 +1,105 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils.custom_logger import setup_logging
+
+logger_manager = setup_logging(log_to_file=True)
+logger = logger_manager.get_logger(__name__)
+
+
+class ChangeDetector:
+    """
+    Cheap frame-change detector based on downsampled block signatures.
+
+    Every frame is box-downsampled by `sample` and split into blocks of `block_size` pixels (in full
+    frame resolution). A block is dirty when its mean absolute grayscale difference from that block's
+    reference exceeds `threshold`. The reference of a block is only replaced when the block is reported
+    dirty, so a change that builds up slowly over many frames is still detected once it adds up. Each
+    stream (the whole window, or one ROI) is tracked under its own key, and every block keeps a version
+    counter that is bumped whenever it changes.
+
+    Parameters:
+    - block_size (int): Block edge length in full-resolution pixels. Must be a multiple of `sample`. Default is 32.
+    - sample (int): Downsampling factor applied before comparing frames. Default is 4.
+    - threshold (float): Mean absolute difference (0-255) above which a block counts as changed. Default is 3.0.
+    """
+
+    def __init__(self, block_size: int = 32, sample: int = 4, threshold: float = 3.0):
+        if block_size % sample:
+            raise ValueError("block_size must be a multiple of sample.")
+        self.block_size = block_size
+        self.sample = sample
+        self.threshold = threshold
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._versions: Dict[str, np.ndarray] = {}
+        self._epochs: Dict[str, int] = {}
+
+    def _signature(self, image) -> np.ndarray:
+        """Downsample a PIL image or NumPy array (HxW or HxWxC) to a float32 grayscale thumbnail."""
+        if isinstance(image, Image.Image):
+            small = np.array(image.reduce(self.sample), dtype=np.float32)
+        else:
+            image = np.asarray(image)
+            height = image.shape[0] - image.shape[0] % self.sample
+            width = image.shape[1] - image.shape[1] % self.sample
+            blocks = image[:height, :width].reshape(height // self.sample, self.sample, width // self.sample,
+                                                    self.sample, *image.shape[2:])
+            small = blocks.mean(axis=(1, 3), dtype=np.float32)
+        if small.ndim == 3:
+            small = small[..., :3].mean(axis=2)  # Ignore alpha, equal channel weights are enough here
+        return small
+
+    def update(self, image, key: str = 'window') -> List[Tuple[int, int, int, int]]:
+        """
+        Compare `image` with the reference blocks of stream `key`, and take its dirty blocks as their new reference.
+        Returns the dirty regions as (left, top, width, height) boxes in frame coordinates. The first
+        frame of a stream, or a frame whose size changed, is reported as entirely dirty.
+        """
+        signature = self._signature(image)
+        cells = self.block_size // self.sample
+        grid_height = -(-signature.shape[0] // cells)
+        grid_width = -(-signature.shape[1] // cells)
+
+        reference = self._signatures.get(key)
+        if reference is None or reference.shape != signature.shape:
+            self._signatures[key] = signature
+            self._epochs[key] = self._epochs.get(key, 0) + 1
+            self._versions[key] = np.zeros((grid_height, grid_width), dtype=np.int64)
+            return [(0, 0, grid_width * self.block_size, grid_height * self.block_size)]
+
+        # Pad to whole blocks, then take the mean difference per block
+        diff = np.abs(signature - reference)
+        padded = np.zeros((grid_height * cells, grid_width * cells), dtype=np.float32)
+        padded[:diff.shape[0], :diff.shape[1]] = diff
+        block_diff = padded.reshape(grid_height, cells, grid_width, cells).mean(axis=(1, 3))
+
+        dirty = block_diff > self.threshold
+        self._versions[key] += dirty
+        changed = np.repeat(np.repeat(dirty, cells, axis=0), cells, axis=1)[:signature.shape[0], :signature.shape[1]]
+        reference[changed] = signature[changed]
+        rows, cols = np.nonzero(dirty)
+        return [(int(col) * self.block_size, int(row) * self.block_size, self.block_size, self.block_size)
+                for row, col in zip(rows, cols)]
+
+    def version(self, key: str = 'window', box: Optional[Tuple[int, int, int, int]] = None) -> Tuple[int, int]:
+        """
+        Return a token identifying the current content of stream `key`, optionally restricted to the
+        (left, top, width, height) `box`. The token only changes when a block inside the region changes.
+        """
+        versions = self._versions.get(key)
+        if versions is None:
+            return 0, -1
+        if box is not None:
+            left, top, width, height = box
+            versions = versions[top // self.block_size:-(-(top + height) // self.block_size),
+                                left // self.block_size:-(-(left + width) // self.block_size)]
+        return self._epochs[key], int(versions.sum())
+
+    def reset(self, key: Optional[str] = None) -> None:
+        """Forget the reference blocks of stream `key`, or of every stream."""
+        keys = [key] if key else list(self._signatures)
+        for name in keys:
+            self._signatures.pop(name, None)
+            self._versions.pop(name, None)
@@ -1,7 +1,12 @@
+import atexit
+import copy
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 import threading
+import time
 
 import colorama
 
@@ -11,6 +16,9 @@ colorama.init(autoreset=True)  # Initialize colorama
 class CustomFormatter(logging.Formatter):
     """
     Custom logging formatter to add color coding to logs based on log level.
+
+    One formatter per level is built up front for both TTY and plain output, and whether stdout is a
+    TTY is checked once, when the formatter is created, instead of on every record.
     """
 
     grey = "\x1b[38;20m"
@@ -23,6 +31,7 @@ class CustomFormatter(logging.Formatter):
     reset = "\x1b[0m"
 
     base_format = "(%(asctime)s) [%(levelname)s] (%(filename)s:%(lineno)d) - %(message)s"
+    date_format = '%Y-%m-%d %H:%M:%S'
 
     FORMATS = {
         logging.DEBUG: light_grey + base_format + reset,
@@ -32,13 +41,173 @@ class CustomFormatter(logging.Formatter):
         logging.CRITICAL: bold_red + base_format + reset
     }
 
+    def __init__(self, tty=None):
+        super().__init__(self.base_format, datefmt=self.date_format)
+        self.tty = sys.stdout.isatty() if tty is None else tty
+        self._plain = logging.Formatter(self.base_format, datefmt=self.date_format, style='%')
+        self._colored = {level: logging.Formatter(fmt, datefmt=self.date_format, style='%')
+                         for level, fmt in self.FORMATS.items()}
+
     def format(self, record):
-        if sys.stdout.isatty():
-            log_fmt = self.FORMATS.get(record.levelno, self.base_format)
-        else:
-            log_fmt = self.base_format  # No color codes for non-TTY outputs
-        formatter = logging.Formatter(log_fmt, datefmt='%Y-%m-%d %H:%M:%S', style='%')
-        return formatter.format(record)
+        if self.tty:
+            return self._colored.get(record.levelno, self._plain).format(record)
+        return self._plain.format(record)  # No color codes for non-TTY outputs
+
+
+_call_counts = {}
+_last_logged = {}
+
+
+def _call_site(stacklevel):
+    frame = sys._getframe(stacklevel + 1)
+    return frame.f_code.co_filename, frame.f_lineno
+
+
+def log_every_n(logger, level, n, msg, *args, key=None):
+    """
+    Log `msg % args` on the first call and then once every `n` calls, for per-frame messages.
+    Calls are counted per `key`, by default the calling line. Disabled levels cost one level check.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    key = key if key is not None else _call_site(1)
+    count = _call_counts.get(key, 0)
+    _call_counts[key] = count + 1
+    if count % n == 0:
+        logger.log(level, msg, *args, stacklevel=2)
+
+
+def log_rate_limited(logger, level, interval, msg, *args, key=None):
+    """
+    Log `msg % args` at most once every `interval` seconds per `key`, by default the calling line.
+    Disabled levels cost one level check.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    key = key if key is not None else _call_site(1)
+    now = time.monotonic()
+    if now - _last_logged.get(key, -interval) >= interval:
+        _last_logged[key] = now
+        logger.log(level, msg, *args, stacklevel=2)
+
+
+_STOP = object()
+
+
+def _emit_batch(handler, records):
+    """Emit several records on one handler; streams and files get a single write and flush per batch."""
+    records = [record for record in records if record.levelno >= handler.level and handler.filter(record)]
+    if not records:
+        return
+    if not isinstance(handler, logging.StreamHandler):
+        for record in records:
+            handler.handle(record)
+        return
+    with handler.lock:
+        lines = []
+        for record in records:
+            try:
+                lines.append(handler.format(record) + handler.terminator)
+            except Exception:
+                handler.handleError(record)
+        try:
+            if handler.stream is None:  # FileHandler opened with delay=True
+                handler.stream = handler._open()
+            handler.stream.write(''.join(lines))
+            handler.flush()
+        except Exception:
+            handler.handleError(records[-1])
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the logging thread.
+
+    Each instance stands in for the sinks of one logger and enqueues (sinks, record) pairs. Only the
+    message is merged on the calling thread; formatting and I/O happen on the listener thread. When
+    the queue is full the newest record is dropped, or with `drop_policy='oldest'` the oldest queued one.
+    """
+
+    def __init__(self, log_queue, sinks, listener, drop_policy='newest'):
+        super().__init__(log_queue)
+        self.sinks = tuple(sinks)
+        self.listener = listener
+        self.drop_policy = drop_policy
+
+    def prepare(self, record):
+        # Merge into a copy: other handlers on the logger's hierarchy still see the original msg and args
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        item = (self.sinks, record)
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if self.drop_policy == 'oldest':
+                try:
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(item)
+                except (queue.Empty, queue.Full):
+                    pass
+            self.listener.dropped += 1
+
+
+class BatchingListener:
+    """
+    Single background thread owning every log sink.
+
+    It blocks for the next record, drains up to `batch_size` more without waiting, and writes each
+    sink's share of the batch at once. Drops reported by the queue handlers are logged as a warning
+    on the next batch.
+    """
+
+    def __init__(self, log_queue, batch_size=256):
+        self.queue = log_queue
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._reported = 0
+        self._sinks = set()
+        self._thread = threading.Thread(target=self._run, name="LogListener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            items = [self.queue.get()]
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(item is _STOP for item in items)
+            self._dispatch([item for item in items if item is not _STOP])
+            if stop:
+                return
+
+    def _dispatch(self, items):
+        by_sink = {}
+        for sinks, record in items:
+            for sink in sinks:
+                by_sink.setdefault(sink, []).append(record)
+        dropped = self.dropped - self._reported
+        if dropped:
+            self._reported += dropped
+            warning = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                        f"Log queue full, dropped {dropped} records", None, None)
+            for sink in self._sinks:
+                by_sink.setdefault(sink, []).append(warning)
+        for sink, records in by_sink.items():
+            self._sinks.add(sink)
+            _emit_batch(sink, records)
+
+    def stop(self, timeout=5.0):
+        """Write every queued record and stop the thread."""
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
 
 
 class SingletonLogger:
@@ -62,6 +231,9 @@ class SingletonLogger:
             self._log_to_stdout = log_to_stdout
             self._central_log = central_log
             self._loggers = {}
+            self._sinks = {}  # Logger name ('' for the root logger) -> handlers writing its records
+            self._queue = None
+            self._listener = None
             self._setup_logging()
 
     def _setup_logging(self):
@@ -79,7 +251,7 @@ class SingletonLogger:
             file_handler.setLevel(self._level)
             root_logger = logging.getLogger()
             root_logger.setLevel(self._level)
-            root_logger.addHandler(file_handler)
+            self._attach(root_logger, '', [file_handler])
 
     def _suppress_external_logs(self):
         external_loggers = ['PIL', 'urllib3']
@@ -102,11 +274,12 @@ class SingletonLogger:
             if log_to_stdout is None:
                 log_to_stdout = self._log_to_stdout
 
+            handlers = []
             if log_to_stdout:
                 stream_handler = logging.StreamHandler(sys.stdout)
                 stream_handler.setFormatter(self._formatter)
                 stream_handler.setLevel(self._level)
-                logger.addHandler(stream_handler)
+                handlers.append(stream_handler)
 
             # Determine whether to log to file
             if log_to_file is None:
@@ -126,13 +299,111 @@ class SingletonLogger:
                     file_handler = logging.FileHandler(module_filename, mode='a')
                     file_handler.setFormatter(self._formatter)
                     file_handler.setLevel(self._level)
-                    logger.addHandler(file_handler)
+                    handlers.append(file_handler)
 
+            if handlers:
+                self._attach(logger, module_name, handlers)
             self._loggers[module_name] = logger
             return logger
 
+    def _attach(self, logger, name, handlers):
+        """Add `handlers` to `logger`, behind a queue handler when the queue mode is enabled."""
+        self._sinks.setdefault(name, []).extend(handlers)
+        if self._queue is None:
+            for handler in handlers:
+                logger.addHandler(handler)
+        else:
+            self._replace_handlers(logger, name)
+
+    def _replace_handlers(self, logger, name):
+        for handler in list(logger.handlers):
+            if isinstance(handler, BoundedQueueHandler) or handler in self._sinks[name]:
+                logger.removeHandler(handler)
+        logger.addHandler(BoundedQueueHandler(self._queue, self._sinks[name], self._listener, self._drop_policy))
+
+    def enable_queue(self, max_queue=10000, drop_policy='newest', batch_size=256):
+        """
+        Opt in to non-blocking logging: every logger's sinks move behind a bounded queue and a single
+        listener thread writes them in batches. Loggers created before and after the call are covered.
+        When the queue is full, the newest record (or the oldest with `drop_policy='oldest'`) is dropped
+        and counted in `dropped`. Remaining records are written at exit, or by calling `disable_queue`.
+        Calling it again while enabled has no effect.
+        """
+        if self._queue is not None:
+            return
+        if drop_policy not in ('newest', 'oldest'):
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected 'newest' or 'oldest'.")
+        self._drop_policy = drop_policy
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._listener = BatchingListener(self._queue, batch_size)
+        self._listener.start()
+        for name in self._sinks:
+            self._replace_handlers(logging.getLogger(name or None), name)
+        atexit.register(self.disable_queue)
+
+    def disable_queue(self, timeout=5.0):
+        """Write the queued records, stop the listener thread and attach the sinks to their loggers again."""
+        if self._queue is None:
+            return
+        for name, handlers in self._sinks.items():
+            logger = logging.getLogger(name or None)
+            for handler in list(logger.handlers):
+                if isinstance(handler, BoundedQueueHandler):
+                    logger.removeHandler(handler)
+            for handler in handlers:
+                logger.addHandler(handler)
+        self._listener.stop(timeout)
+        self._queue = None
+        atexit.unregister(self.disable_queue)
+
+    @property
+    def dropped(self):
+        """Number of records dropped because the queue was full."""
+        return self._listener.dropped if self._listener else 0
+
 
 def setup_logging(level=logging.DEBUG, log_to_file=True, filename='logs/application.log',
-                  log_to_stdout=False, central_log=True):
+                  log_to_stdout=False, central_log=True, use_queue=False):
     logger_manager = SingletonLogger(level, log_to_file, filename, log_to_stdout, central_log)
+    if use_queue:
+        logger_manager.enable_queue()
     return logger_manager
+
+
+def _benchmark(records=20000):
+    """Per-record overhead of formatting and of disabled log calls, before and after caching."""
+    formatter = CustomFormatter()
+
+    def legacy_format(record):
+        # CustomFormatter.format before the formatters were cached
+        if sys.stdout.isatty():
+            log_fmt = CustomFormatter.FORMATS.get(record.levelno, CustomFormatter.base_format)
+        else:
+            log_fmt = CustomFormatter.base_format
+        return logging.Formatter(log_fmt, datefmt='%Y-%m-%d %H:%M:%S', style='%').format(record)
+
+    record = logging.LogRecord(__name__, logging.INFO, __file__, 1, "Found image at %s after %.2f seconds",
+                               ((10, 20, 30, 40), 0.0123), None)
+
+    def per_record(function):
+        start = time.perf_counter()
+        for _ in range(records):
+            function()
+        return (time.perf_counter() - start) / records * 1e6
+
+    logger = logging.getLogger('benchmark')
+    logger.setLevel(logging.INFO)
+    box, elapsed = (10, 20, 30, 40), 0.0123
+    results = {
+        'format (per-record Formatter)': per_record(lambda: legacy_format(record)),
+        'format (cached formatters)': per_record(lambda: formatter.format(record)),
+        'disabled debug, f-string': per_record(lambda: logger.debug(f"Found image at {box} after {elapsed:.2f}s")),
+        'disabled debug, %-style': per_record(lambda: logger.debug("Found image at %s after %.2fs", box, elapsed)),
+        'disabled log_every_n': per_record(lambda: log_every_n(logger, logging.DEBUG, 30, "Frame %d", 1)),
+    }
+    for name, microseconds in results.items():
+        print(f"{name:32s} {microseconds:7.2f} us/record")
+
+
+if __name__ == "__main__":
+    _benchmark()
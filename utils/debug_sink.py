@@ -0,0 +1,137 @@
+import atexit
+import os
+import queue
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+from PIL import Image
+
+from utils.custom_logger import setup_logging
+from utils.screen_capture import Frame, frame_to_image
+
+logger_manager = setup_logging(log_to_file=True)
+logger = logger_manager.get_logger(__name__)
+
+_STOP = object()
+
+
+class DebugSink:
+    """
+    Write debug artifacts (images and text) on a background thread, off the automation hot path.
+
+    Artifacts are put on a bounded queue and encoded and written by a single writer thread. When the
+    queue is full, because the disk cannot keep up, new artifacts are dropped instead of blocking the
+    caller; `dropped` counts them. Sampling decides which artifacts are kept at all: failures are always
+    recorded, successes only every `every_n` iterations, and never with `failures_only`. The writer is a
+    daemon thread, so `close` is also registered with atexit to write what is still queued at exit.
+
+    Parameters:
+    - output_dir (str): Directory the artifacts are written to. Default is 'screenshots'.
+    - every_n (int): Record successful iterations whose number is a multiple of this. 0 disables them. Default is 1.
+    - failures_only (bool): Only record artifacts flagged as failures. Default is False.
+    - max_queue (int): Maximum number of artifacts waiting to be written. Default is 32.
+    """
+
+    def __init__(self, output_dir: str = 'screenshots', every_n: int = 1, failures_only: bool = False,
+                 max_queue: int = 32):
+        self.output_dir = output_dir
+        self.every_n = every_n
+        self.failures_only = failures_only
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def should_record(self, iteration: Optional[int] = None, failure: bool = False) -> bool:
+        """Whether an artifact of `iteration` passes the sampling settings."""
+        if failure:
+            return True
+        if self.failures_only or not self.every_n:
+            return False
+        return iteration is None or iteration % self.every_n == 0
+
+    def save_image(self, image, file_name: str, iteration: Optional[int] = None, failure: bool = False,
+                   annotate: Optional[Callable[[Image.Image], None]] = None) -> bool:
+        """
+        Queue an image to be saved as `file_name`. `image` may be a PIL image, an RGB array or a capture
+        Frame; arrays are copied, so ring-buffer frames can be passed directly, while PIL images must not be
+        modified afterwards. `annotate` is called with the PIL image on the writer thread, before saving,
+        to draw markers. Returns False if the image was sampled out or dropped.
+        """
+        if not self.should_record(iteration, failure):
+            return False
+        if isinstance(image, Frame):
+            image = image._replace(image=image.image.copy())
+        elif isinstance(image, np.ndarray):
+            image = image.copy()
+        return self._put(('image', file_name, image, annotate))
+
+    def save_text(self, text: str, file_name: str, iteration: Optional[int] = None, failure: bool = False) -> bool:
+        """Queue a text file, e.g. an error message. Returns False if it was sampled out or dropped."""
+        if not self.should_record(iteration, failure):
+            return False
+        return self._put(('text', file_name, text, None))
+
+    def _put(self, item) -> bool:
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.debug("Debug queue full, dropped %s", item[1])
+            return False
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                os.makedirs(self.output_dir, exist_ok=True)
+                self._thread = threading.Thread(target=self._writer, name="DebugSink", daemon=True)
+                self._thread.start()
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._write(*item)
+                self.written += 1
+            except Exception as e:
+                logger.error("Failed to write debug artifact %s: %s", item[1], e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, kind, file_name, payload, annotate):
+        path = os.path.join(self.output_dir, file_name)
+        if kind == 'text':
+            with open(path, 'w') as f:
+                f.write(payload)
+            return
+        if isinstance(payload, Frame):
+            payload = frame_to_image(payload)
+        elif isinstance(payload, np.ndarray):
+            if payload.dtype != np.uint8:
+                payload = np.clip(payload, 0, 255).astype(np.uint8)
+            payload = Image.fromarray(payload)
+        if annotate:
+            annotate(payload)
+        payload.save(path)
+
+    def flush(self) -> None:
+        """Block until every queued artifact has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write the remaining artifacts and stop the writer thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+        logger.debug("Debug sink closed: %d artifacts written, %d dropped", self.written, self.dropped)
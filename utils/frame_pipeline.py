@@ -0,0 +1,86 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import numpy as np
+
+from utils.custom_logger import setup_logging
+from utils.debug_sink import DebugSink
+from utils.screen_capture import ScreenCapture
+
+logger_manager = setup_logging(log_to_file=True)
+logger = logger_manager.get_logger(__name__)
+
+
+class FramePipeline:
+    """
+    Per-stage latency tracking for the in-memory capture -> preprocess -> locate loop.
+
+    `vision_tools.wait_for_template(..., pipeline=pipeline)` runs every frame it processes through the
+    'capture' (grab inline or wait for the background thread), 'preprocess' (ROI crop and grayscale
+    conversion) and 'locate' stages, then hands the searched frame to `record`. Nothing is written to disk
+    unless `debug_dir` is set, and then frames go through a sampled background DebugSink ('debug_write'
+    only times the hand-off). With `roi` set, only that named region is captured and it is searched at
+    native scale.
+
+    Parameters:
+    - screen_capture (ScreenCapture): Capture source with the target window already set.
+    - debug_dir (str): If given, searched frames are also saved there as PNGs. Default is None.
+    - roi (str): Name of a ScreenCapture ROI to capture instead of the whole window. Default is None.
+    - debug_every (int): With `debug_dir`, save every n-th frame. Default is 10.
+    """
+
+    def __init__(self, screen_capture: ScreenCapture, debug_dir: Optional[str] = None, roi: Optional[str] = None,
+                 debug_every: int = 10):
+        self.screen_capture = screen_capture
+        self.debug_dir = debug_dir
+        self.roi = roi
+        self.frames = 0
+        self.last_timings: Dict[str, float] = {}
+        self._totals: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._sink = None
+        if debug_dir:
+            self._sink = DebugSink(debug_dir, every_n=debug_every)
+            logger.warning(f"FramePipeline debug mode enabled, one frame in {debug_every} will be written to "
+                           f"{debug_dir}")
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block and record it as pipeline stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.last_timings[name] = elapsed
+            self._totals[name] = self._totals.get(name, 0.0) + elapsed
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def start_frame(self) -> None:
+        """Begin timing a new frame; `last_timings` then only holds the stages of that frame."""
+        self.last_timings = {}
+
+    def record(self, frame: np.ndarray) -> None:
+        """Count a processed frame and, in debug mode, queue it on the debug sink."""
+        if self._sink is not None:
+            with self.stage('debug_write'):
+                self._sink.save_image(frame, f'frame_{self.frames}.png', iteration=self.frames)
+        self.frames += 1
+
+    def close(self) -> None:
+        """Write the queued debug frames, if any."""
+        if self._sink is not None:
+            self._sink.close()
+
+    def latency_report(self) -> Dict[str, float]:
+        """Return the mean latency of each stage in milliseconds."""
+        return {name: 1000 * total / self._counts[name] for name, total in self._totals.items()}
+
+    def log_latency(self) -> None:
+        """Log the timings of the most recent frame at debug level."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        timings = ", ".join(f"{name}={1000 * elapsed:.1f}ms" for name, elapsed in self.last_timings.items())
+        logger.debug("Frame %d stage latency: %s", self.frames, timings)
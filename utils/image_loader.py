@@ -1,9 +1,17 @@
+import os
 from io import BytesIO
 from pathlib import Path
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Iterable, Iterator, Optional
 
+import numpy as np
 from PIL import Image, ImageOps, ImageGrab, UnidentifiedImageError
 
+try:
+    import cv2
+except ImportError:  # OpenCV is optional, preprocess_array falls back to NumPy resampling
+    cv2 = None
+
+from utils.asset_store import PreprocessedAssetStore
 from utils.assets_path_loader import load_assets
 from utils.custom_logger import setup_logging
 
@@ -24,6 +32,17 @@ class ImageLoader:
     def __init__(self, target_size: Tuple[int, int] = (1280, 720), color_mode: str = 'RGB'):
         self.target_size = target_size
         self.color_mode = color_mode
+        self._letterbox_buffer = None
+        self._letterbox_geometry = None
+        self._resample_maps = {}
+
+    def _letterbox_geometry_for(self, width: int, height: int) -> Tuple[float, int, int, int, int]:
+        """Scale, resized size and paste offset that letterbox a width x height image into the target size."""
+        target_width, target_height = self.target_size
+        scale = min(target_width / width, target_height / height)
+        new_width = int(width * scale)
+        new_height = int(height * scale)
+        return scale, new_width, new_height, (target_width - new_width) // 2, (target_height - new_height) // 2
 
     def _preprocess_image(self, img: Image.Image) -> Tuple[Image.Image, Tuple[float, float]]:
         """
@@ -43,18 +62,13 @@ class ImageLoader:
 
             # Resize while maintaining aspect ratio and pad to target size
             if self.target_size:
-                target_width, target_height = self.target_size
-
                 # Compute scaling factor to maintain aspect ratio
-                scale = min(target_width / original_width, target_height / original_height)
-                new_width = int(original_width * scale)
-                new_height = int(original_height * scale)
+                scale, new_width, new_height, left, top = self._letterbox_geometry_for(original_width,
+                                                                                       original_height)
                 img = img.resize((new_width, new_height), Image.LANCZOS)
 
                 # Create new image with target size and paste the resized image onto it, centering the image
                 new_img = Image.new(self.color_mode, self.target_size, (0, 0, 0))
-                left = (target_width - new_width) // 2
-                top = (target_height - new_height) // 2
                 new_img.paste(img, (left, top))
 
                 # Update img
@@ -73,6 +87,57 @@ class ImageLoader:
             logger.error(f"Error in preprocessing image: {e}")
             raise
 
+    def preprocess_array(self, frame: np.ndarray, resample: str = 'bilinear',
+                         out: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Tuple[float, float]]:
+        """
+        Letterbox an in-memory frame array (HxW or HxWxC, already in the wanted channel order) to the target size.
+
+        The fast counterpart of `_preprocess_image` for captures: no EXIF handling, no PIL round trip, and a
+        cheap resampler ('nearest' or 'bilinear', through OpenCV when available, else NumPy or PIL). The
+        result is written into `out`, or into a buffer owned by this loader that is reused by the next call,
+        so copy it if it must be kept. Frames that already match the target size are returned unchanged.
+        Returns the array and the same scaling factors `_preprocess_image` would return.
+        """
+        if resample not in ('nearest', 'bilinear'):
+            raise ValueError(f"Unknown resample method '{resample}'. Expected 'nearest' or 'bilinear'.")
+        height, width = frame.shape[:2]
+        if not self.target_size or (width, height) == tuple(self.target_size):
+            return frame, (1.0, 1.0)
+
+        scale, new_width, new_height, left, top = self._letterbox_geometry_for(width, height)
+        target_width, target_height = self.target_size
+        shape = (target_height, target_width) + frame.shape[2:]
+        if out is None:
+            if self._letterbox_buffer is None or self._letterbox_buffer.shape != shape:
+                self._letterbox_buffer = np.zeros(shape, dtype=frame.dtype)
+                self._letterbox_geometry = None
+            out = self._letterbox_buffer
+            # The borders stay black between frames of the same geometry, only clear them when it changes
+            geometry = (new_width, new_height, left, top)
+            if self._letterbox_geometry != geometry:
+                out.fill(0)
+                self._letterbox_geometry = geometry
+        else:
+            out.fill(0)
+
+        out[top:top + new_height, left:left + new_width] = self._resize(frame, new_width, new_height, resample)
+        return out, (scale, scale)
+
+    def _resize(self, frame: np.ndarray, width: int, height: int, resample: str) -> np.ndarray:
+        if cv2 is not None:
+            interpolation = cv2.INTER_NEAREST if resample == 'nearest' else cv2.INTER_LINEAR
+            return cv2.resize(frame, (width, height), interpolation=interpolation)
+        if resample == 'bilinear':
+            return np.asarray(Image.fromarray(frame).resize((width, height), Image.BILINEAR))
+
+        # Nearest neighbour as two gathers with source indices cached per geometry
+        key = (frame.shape[:2], width, height)
+        if key not in self._resample_maps:
+            self._resample_maps[key] = (_nearest_indices(frame.shape[0], height),
+                                        _nearest_indices(frame.shape[1], width))
+        rows, cols = self._resample_maps[key]
+        return frame.take(rows, axis=0).take(cols, axis=1)
+
     def load_image(self, filepath: str) -> Tuple[Image.Image, Tuple[float, float]]:
         """
         Load and preprocess an image from a file path.
@@ -117,26 +182,49 @@ class ImageLoader:
             logger.error(f"Failed to display image: {e}")
 
 
-def process_images(loader: ImageLoader, assets: Dict[str, Dict[str, str]]) -> None:
-    """Process images in the 'screens' category."""
+def _nearest_indices(size_in: int, size_out: int) -> np.ndarray:
+    """Source index of every output pixel along one axis for nearest-neighbour resizing, as OpenCV computes it."""
+    return np.minimum((np.arange(size_out) * size_in) // size_out, size_in - 1).astype(np.intp)
+
+
+def process_images(loader: ImageLoader, assets: Dict[str, Dict[str, str]],
+                   workers: int = 1) -> Optional[PreprocessedAssetStore]:
+    """
+    Preprocess the images in the 'screens' category into a PreprocessedAssetStore in their 'processed' folder.
+    Only images whose source changed since the last run are processed again. With `workers` > 1 they are
+    processed in parallel, see `process_images_batch`. Returns the store.
+    """
     screens_assets = assets.get('screens', {})
 
     if not screens_assets:
         logger.warning("No images found in assets under 'screens' category.")
-        return
-
-    for image_name, path_in in screens_assets.items():
-        processed_dir = Path(path_in).parent / 'processed'
-        processed_dir.mkdir(parents=True, exist_ok=True)
-
-        path_out = str(processed_dir / f'{image_name}_preprocessed.png')
-
-        try:
-            image, (scale_x, scale_y) = loader.load_image(path_in)
-            loader.save_image(image, path_out)
-            logger.debug(f'Image {image_name} processed with scaling factors: scale_x={scale_x}, scale_y={scale_y}')
-        except Exception as e:
-            logger.error(f"Failed to process image {image_name}: {e}")
+        return None
+
+    processed_dir = Path(next(iter(screens_assets.values()))).parent / 'processed'
+    store = PreprocessedAssetStore(loader, processed_dir)
+    if workers > 1:
+        entries = store.iter_update(screens_assets, workers=workers)
+    else:
+        entries = store.update(screens_assets).items()
+    for image_name, entry in entries:
+        scale_x, scale_y = entry['scale']
+        logger.debug(f'Image {image_name} stored with scaling factors: scale_x={scale_x}, scale_y={scale_y}')
+    return store
+
+
+def process_images_batch(loader: ImageLoader, paths: Iterable[str], store_dir: str, workers: Optional[int] = None,
+                         max_pending: Optional[int] = None, root: Optional[str] = None) -> Iterator[Tuple[str, dict]]:
+    """
+    Stream image paths (e.g. thousands of recorded screens) through a bounded process pool into the
+    PreprocessedAssetStore at `store_dir`. Assets are keyed by their path relative to `root` (default: the
+    current directory), e.g. 'session_1/frame_00001', so same-named frames of different sessions do not
+    collide. Yields (name, index entry) as images complete; unreadable files are logged and skipped.
+    Images/s and MB/s are logged at the end.
+    """
+    store = PreprocessedAssetStore(loader, store_dir)
+    root = root or os.curdir
+    names = ((Path(os.path.relpath(path, root)).with_suffix('').as_posix(), path) for path in paths)
+    yield from store.iter_update(names, workers=workers, max_pending=max_pending)
 
 
 def capture_and_process_screen(loader: ImageLoader) -> None:
@@ -165,7 +253,7 @@ def main():
         return
 
     # Process images in 'screens' category
-    process_images(loader, assets)
+    process_images(loader, assets, workers=os.cpu_count() or 1)
 
     # Capture and process screen image
     capture_and_process_screen(loader)
@@ -0,0 +1,125 @@
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils.custom_logger import setup_logging
+
+logger_manager = setup_logging(log_to_file=True)
+logger = logger_manager.get_logger(__name__)
+
+# The inventory is a fixed grid of 4 columns and 7 rows; slots are numbered row by row from the top left.
+INVENTORY_COLUMNS = 4
+INVENTORY_ROWS = 7
+SLOT_SIZE = (42, 36)  # (width, height) of one slot in the classic client layout
+
+# Cells whose masked energy per pixel is below this (grayscale levels squared) are flat and score 0.
+_FLAT_VARIANCE = 1.0
+
+
+class InventoryReader:
+    """
+    Classify the inventory slots directly instead of searching the screen for each item.
+
+    The 'inventory' ROI of a ScreenCapture is grabbed in grayscale, split into its slot cells with a
+    reshape, and every cell is compared with every item template in one batch of matrix products.
+    The comparison is the masked normalized cross-correlation of the cell with the template placed at
+    the cell center, so scores range from -1 to 1 like template_matching scores. Only the pixels
+    covered by the template (its opaque pixels, when it has transparency) are compared, which keeps
+    the slot background out of the score.
+
+    Parameters:
+    - screen_capture (ScreenCapture): Capture whose ROI `roi` covers the grid exactly.
+    - templates (dict): Item images (paths, PIL images or arrays) keyed by name, e.g. load_assets()['items'].
+    - roi (str): Name of the ROI covering the inventory grid. Default is 'inventory'.
+    - threshold (float): Minimum score for a slot to be assigned an item. Default is 0.6.
+    - slot_size (Tuple[int, int]): (width, height) of one slot. Default is SLOT_SIZE.
+    - item_size (Tuple[int, int]): Box each template is scaled to fit in, keeping its aspect ratio.
+      Default is the slot size.
+    """
+
+    def __init__(self, screen_capture, templates: Dict[str, object], roi: str = 'inventory', threshold: float = 0.6,
+                 slot_size: Tuple[int, int] = SLOT_SIZE, item_size: Optional[Tuple[int, int]] = None):
+        self.screen_capture = screen_capture
+        self.roi = roi
+        self.threshold = threshold
+        self.slot_size = slot_size
+        self.item_size = item_size or slot_size
+        self.names = list(templates)
+        self._prepare_templates(templates)
+
+    def _fit_template(self, image) -> Tuple[np.ndarray, np.ndarray]:
+        """Scale a template into the item box and center it on a slot-sized canvas. Returns (gray, mask)."""
+        if isinstance(image, (str, os.PathLike)):
+            with Image.open(image) as img:
+                image = img.convert('RGBA')
+        elif isinstance(image, Image.Image):
+            image = image.convert('RGBA')
+        else:
+            image = Image.fromarray(np.asarray(image)).convert('RGBA')
+        scale = min(self.item_size[0] / image.width, self.item_size[1] / image.height)
+        size = (max(int(image.width * scale), 1), max(int(image.height * scale), 1))
+        image = image.resize(size, Image.LANCZOS)
+
+        slot_width, slot_height = self.slot_size
+        canvas = Image.new('RGBA', self.slot_size, (0, 0, 0, 0))
+        canvas.paste(image, ((slot_width - size[0]) // 2, (slot_height - size[1]) // 2))
+        gray = np.asarray(canvas.convert('L'), dtype=np.float64)
+        mask = np.asarray(canvas.getchannel('A')) > 0
+        return gray, mask
+
+    def _prepare_templates(self, templates: Dict[str, object]) -> None:
+        """Precompute the (templates x pixels) matrices used by `scores`."""
+        fitted = [self._fit_template(image) for image in templates.values()]
+        grays = np.stack([gray.ravel() for gray, _ in fitted])
+        masks = np.stack([mask.ravel() for _, mask in fitted]).astype(np.float64)
+        self._masks = masks
+        self._counts = masks.sum(axis=1)
+        means = (grays * masks).sum(axis=1) / self._counts
+        self._centered = (grays - means[:, None]) * masks  # Zero outside the mask and zero-mean inside it
+        self._energies = (self._centered ** 2).sum(axis=1)
+        logger.debug(f"Prepared {len(self.names)} inventory templates for {self.slot_size} slots")
+
+    def cells(self, grid: np.ndarray) -> np.ndarray:
+        """Split a grayscale grid image into a (slots, pixels) array, cropping anything beyond the grid."""
+        slot_width, slot_height = self.slot_size
+        height, width = INVENTORY_ROWS * slot_height, INVENTORY_COLUMNS * slot_width
+        grid = np.asarray(grid)
+        if grid.ndim == 3:
+            grid = grid[..., :3].mean(axis=2)
+        if grid.shape[0] < height or grid.shape[1] < width:
+            raise ValueError(f"Inventory image of size {grid.shape[1]}x{grid.shape[0]} is smaller than the "
+                             f"{width}x{height} grid.")
+        blocks = grid[:height, :width].reshape(INVENTORY_ROWS, slot_height, INVENTORY_COLUMNS, slot_width)
+        return blocks.transpose(0, 2, 1, 3).reshape(INVENTORY_ROWS * INVENTORY_COLUMNS, -1).astype(np.float64)
+
+    def scores(self, grid: np.ndarray) -> np.ndarray:
+        """Masked NCC of every slot against every template, as a (slots, templates) array."""
+        cells = self.cells(grid)
+        cells -= cells.mean(axis=1, keepdims=True)  # Does not change the scores, but keeps the sums small
+        numerator = cells @ self._centered.T
+        sums = cells @ self._masks.T
+        cell_energy = (cells * cells) @ self._masks.T - sums * sums / self._counts
+        denominator = np.sqrt(np.maximum(cell_energy, 0.0) * self._energies)
+        scores = np.zeros_like(numerator)
+        np.divide(numerator, denominator, out=scores, where=cell_energy > _FLAT_VARIANCE * self._counts)
+        return scores
+
+    def classify(self, grid: np.ndarray) -> Dict[int, Optional[str]]:
+        """Map every slot index to the best scoring item name, or None for empty or unknown slots."""
+        scores = self.scores(grid)
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(scores)), best]
+        return {slot: self.names[index] if score >= self.threshold else None
+                for slot, (index, score) in enumerate(zip(best, best_scores))}
+
+    def read(self) -> Dict[int, Optional[str]]:
+        """Capture the inventory ROI and classify its slots."""
+        return self.classify(self.screen_capture.capture_to_array(mode='L', roi=self.roi))
+
+    def slot_box(self, slot: int) -> Tuple[int, int, int, int]:
+        """(left, top, width, height) of a slot, relative to the inventory ROI."""
+        row, column = divmod(slot, INVENTORY_COLUMNS)
+        slot_width, slot_height = self.slot_size
+        return column * slot_width, row * slot_height, slot_width, slot_height
@@ -1,11 +1,21 @@
-import re
+import threading
+import time
 import tkinter as tk
 from tkinter import TOP
 
+from utils.overlay_markup import parse_markup
 from utils.screen_capture import ScreenCapture
 
 
 class OverlayDrawer:
+    """
+    Always-on-top Tk window showing `<color>`/`<size>` markup as a grid of labels.
+
+    The overlay is retained-mode: labels are created once per grid cell and kept across updates. Each
+    `display_text` only reconfigures the labels whose text, color or size changed, hides cells the new
+    text does not use, and reuses parsed markup from the overlay_markup cache.
+    """
+
     def __init__(self, title="Overlay", window_dimensions=None, relaxed_mode=False):
         self.root = tk.Tk()
         self.root.title(title)
@@ -19,9 +29,11 @@ class OverlayDrawer:
         if window_dimensions:
             self.set_position(window_dimensions[0], window_dimensions[1])  # Initial position
         self._timeout_id = None  # Store the after() ID
+        self._labels = {}  # (row, column) -> tk.Label, kept for reuse
+        self._styles = {}  # (row, column) -> (text, color, size) each label is configured with
+        self._visible = set()  # Positions of the labels currently gridded
 
     def display_text(self, text, timeout=None, font_size=16):
-        self._clear_text()  # Clear previous text
         self._parse_and_display_text(text, font_size)
         self.root.update_idletasks()
         self.root.deiconify()  # Ensure the window is visible
@@ -33,44 +45,38 @@ class OverlayDrawer:
             # Set new timeout
             self._timeout_id = self.root.after(timeout * 1000, self.remove_text)
 
-    def _clear_text(self):
-        for widget in self.text_frame.winfo_children():
-            widget.destroy()
-
     def _parse_and_display_text(self, text, default_font_size):
-        # Parsing logic remains the same...
-        pattern = re.compile(r"<color=(?P<color>[^>]+)>(.*?)</color>|<size=(?P<size>\d+)>(.*?)</size>")
-        segments = []
-        last_end = 0
-
-        for match in pattern.finditer(text):
-            if match.start() > last_end:
-                segments.append({"content": text[last_end:match.start()], "size": default_font_size})
-
-            color = match.group("color")
-            size = match.group("size")
-            if color:
-                segments.append({"color": color, "content": match.group(2), "size": default_font_size})
-            elif size:
-                segments.append({"size": int(size), "content": match.group(4)})
-            last_end = match.end()
-
-        if last_end < len(text):
-            segments.append({"content": text[last_end:], "size": default_font_size})
-
-        # Display segments
-        row = 0
-        col = 0
-        for segment in segments:
-            color = segment.get("color", "white")
-            font_size = segment.get("size", default_font_size)
-            content = segment.get("content", "")
-            label = tk.Label(self.text_frame, text=content, fg=color, bg="black", font=("Helvetica", font_size))
-            label.grid(row=row, column=col, sticky="w")
-            col += 1
-            if "\n" in content:
-                row += 1
-                col = 0
+        cells = parse_markup(text, default_font_size)
+        hidden = set(self._visible)
+        for cell in cells:
+            position = (cell.row, cell.column)
+            style = (cell.text, cell.color, cell.size)
+            hidden.discard(position)
+            label = self._labels.get(position)
+            if label is None:
+                label = tk.Label(self.text_frame, text=cell.text, fg=cell.color, bg="black",
+                                 font=("Helvetica", cell.size))
+                label.grid(row=cell.row, column=cell.column, sticky="w")
+                self._labels[position] = label
+            else:
+                configured = self._styles[position]
+                if configured != style:
+                    changes = {}
+                    if configured[0] != cell.text:
+                        changes['text'] = cell.text
+                    if configured[1] != cell.color:
+                        changes['fg'] = cell.color
+                    if configured[2] != cell.size:
+                        changes['font'] = ("Helvetica", cell.size)
+                    label.configure(**changes)
+                if position not in self._visible:
+                    label.grid()  # Restore a hidden label at its remembered grid position
+            self._styles[position] = style
+            self._visible.add(position)
+
+        for position in hidden:
+            self._labels[position].grid_remove()
+            self._visible.discard(position)
 
     def remove_text(self):
         self.root.withdraw()  # Hide the window without closing it
@@ -101,6 +107,98 @@ class OverlayDrawer:
         self.root.quit()
 
 
+class OverlayThread:
+    """
+    Run an OverlayDrawer on its own Tk thread, fed through a coalescing, rate-limited channel.
+
+    `display_text` has the OverlayDrawer signature but never touches Tk: it stores the text in a
+    single latest-wins slot and returns immediately, so callers on the asyncio loop never wait on
+    rendering. The Tk thread, which creates and owns the window, draws the newest text at most
+    `max_fps` times per second; texts replaced before they were drawn are counted in `coalesced`.
+
+    Parameters:
+    - title (str): Window title. Default is "Overlay".
+    - window_dimensions (tuple): (left, top, width, height) used to position the window. Default is None.
+    - max_fps (float): Maximum number of redraws per second, greater than 0. Default is 4.
+    """
+
+    def __init__(self, title="Overlay", window_dimensions=None, max_fps=4.0):
+        if max_fps <= 0:
+            raise ValueError(f"max_fps must be greater than 0, got {max_fps}.")
+        self.title = title
+        self.window_dimensions = window_dimensions
+        self.max_fps = max_fps
+        self.drawn = 0
+        self.coalesced = 0
+        self.drawer = None
+        self._pending = None  # (text, timeout, font_size) waiting to be drawn
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopping = False
+        self._error = None
+        self._thread = None
+        self._last_draw = 0.0
+
+    def start(self, timeout=5.0):
+        """Start the Tk thread and wait until the window exists. Raises the error if it cannot be created."""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="Overlay", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self._error is not None:
+            self._thread = None
+            raise self._error
+
+    def display_text(self, text, timeout=None, font_size=16):
+        """Queue `text` to be drawn, replacing any text that has not been drawn yet. Never blocks on Tk."""
+        with self._lock:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (text, timeout, font_size)
+
+    def _run(self):
+        try:
+            self.drawer = OverlayDrawer(self.title, window_dimensions=self.window_dimensions)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        self.drawer.root.after(0, self._pump)
+        self.drawer.root.mainloop()
+        self.drawer.root.destroy()
+
+    def _pump(self):
+        """Draw the newest pending text if the refresh interval has passed, then reschedule (Tk thread only)."""
+        if self._stopping:
+            self.drawer.root.quit()
+            return
+        interval = 1.0 / self.max_fps
+        wait = self._last_draw + interval - time.perf_counter()
+        if wait <= 0:
+            with self._lock:
+                pending, self._pending = self._pending, None
+            if pending is not None:
+                self.drawer.display_text(*pending)
+                self.drawn += 1
+                self._last_draw = time.perf_counter()
+                wait = interval
+            else:
+                wait = min(interval, 0.05)  # Poll for new text without delaying the first one by a full interval
+        self.drawer.root.after(max(int(wait * 1000), 1), self._pump)
+
+    def stop(self, timeout=2.0):
+        """Close the window and stop the Tk thread."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._thread.join(timeout)
+        self._thread = None
+
+
 def main():
     def format_number(number):
         """Formats the number with 'k' for thousands and 'm' for millions."""
@@ -0,0 +1,47 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+from typing import Tuple
+
+# `<color=name>text</color>` and `<size=points>text</size>` spans; anything outside them is plain text.
+MARKUP_PATTERN = re.compile(r"<color=(?P<color>[^>]+)>(.*?)</color>|<size=(?P<size>\d+)>(.*?)</size>")
+
+DEFAULT_COLOR = "white"
+
+# One run of text with a single style, placed at (row, column) of the overlay's label grid.
+Cell = namedtuple('Cell', ['row', 'column', 'text', 'color', 'size'])
+
+
+@lru_cache(maxsize=256)
+def _parse_line(line: str, default_font_size: int, default_color: str) -> Tuple[Tuple[str, str, int], ...]:
+    """(text, color, size) of each non-empty run of one line, in column order."""
+    segments = []
+    last_end = 0
+    for match in MARKUP_PATTERN.finditer(line):
+        if match.start() > last_end:
+            segments.append((line[last_end:match.start()], default_color, default_font_size))
+        if match.group("color"):
+            segments.append((match.group(2), match.group("color"), default_font_size))
+        else:
+            segments.append((match.group(4), default_color, int(match.group("size"))))
+        last_end = match.end()
+    if last_end < len(line):
+        segments.append((line[last_end:], default_color, default_font_size))
+    return tuple(segment for segment in segments if segment[0])
+
+
+def parse_markup(text: str, default_font_size: int = 16, default_color: str = DEFAULT_COLOR) -> Tuple[Cell, ...]:
+    """
+    Parse overlay markup into the cells of a label grid.
+
+    Every styled span and every run of plain text between spans takes the next column of the current row,
+    and each newline starts a new row at column 0, so a template whose values change but whose layout does
+    not always maps to the same cells. Spans do not continue across newlines, and empty runs produce no
+    cell. Lines are parsed separately and cached, so redrawing text whose values changed on one line only
+    parses that line again.
+    """
+    cells = []
+    for row, line in enumerate(text.split("\n")):
+        for column, (content, color, size) in enumerate(_parse_line(line, default_font_size, default_color)):
+            cells.append(Cell(row, column, content, color, size))
+    return tuple(cells)
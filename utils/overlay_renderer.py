@@ -0,0 +1,171 @@
+import math
+import time
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from utils.overlay_markup import DEFAULT_COLOR, parse_markup
+from utils.screen_capture import Frame
+
+# Fonts tried in order before falling back to Pillow's built-in font.
+FONT_NAMES = ("DejaVuSans.ttf", "Helvetica.ttc", "arial.ttf")
+
+
+@lru_cache(maxsize=16)
+def _font(size: int):
+    for name in FONT_NAMES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=64)
+def _color(name: str) -> Tuple[int, int, int, int]:
+    try:
+        return ImageColor.getcolor(name, 'RGBA')
+    except ValueError:
+        return ImageColor.getcolor(DEFAULT_COLOR, 'RGBA')
+
+
+@lru_cache(maxsize=1024)
+def _tile(text: str, color: str, size: int) -> Image.Image:
+    """Transparent RGBA image of one cell's text. Tiles are cached, so unchanged cells are never redrawn."""
+    font = _font(size)
+    ascent, descent = font.getmetrics()
+    tile = Image.new('RGBA', (max(math.ceil(font.getlength(text)), 1), ascent + descent), (0, 0, 0, 0))
+    ImageDraw.Draw(tile).text((0, 0), text, fill=_color(color), font=font)
+    return tile
+
+
+class OverlayRenderer:
+    """
+    Headless overlay backend: draw the same `<color>`/`<size>` markup as OverlayDrawer into an RGBA image.
+
+    Text is parsed with overlay_markup.parse_markup and laid out on the same grid as the Tk labels (each
+    column as wide as its widest cell, each row as tall as its tallest). Cell tiles are cached by text,
+    color and size, and the blending weights of the last rendered overlay are kept, so compositing the
+    same statistics onto every captured frame only costs one blend of the overlay rectangle.
+
+    Parameters:
+    - font_size (int): Default font size of unstyled text, as in OverlayDrawer.display_text. Default is 16.
+    - background (tuple): RGBA background of the overlay box. Default is black at the Tk window's 0.8 alpha.
+    - padding (int): Pixels between the box edge and the text. Default is 5.
+    """
+
+    def __init__(self, font_size: int = 16, background=(0, 0, 0, 204), padding: int = 5):
+        self.font_size = font_size
+        self.background = tuple(background)
+        self.padding = padding
+        self._blend_key = None
+        self._blend = None  # (premultiplied RGB, inverse alpha) as uint16 arrays
+
+    def render(self, text: str, font_size: Optional[int] = None) -> Image.Image:
+        """Render markup to a new RGBA image sized to fit the text."""
+        cells = parse_markup(text, font_size or self.font_size)
+        tiles = [_tile(cell.text, cell.color, cell.size) for cell in cells]
+        widths, heights = {}, {}
+        for cell, tile in zip(cells, tiles):
+            widths[cell.column] = max(widths.get(cell.column, 0), tile.width)
+            heights[cell.row] = max(heights.get(cell.row, 0), tile.height)
+        column_x = np.cumsum([0] + [widths.get(column, 0) for column in range(max(widths, default=-1) + 1)])
+        row_y = np.cumsum([0] + [heights.get(row, 0) for row in range(max(heights, default=-1) + 1)])
+
+        size = (int(column_x[-1]) + 2 * self.padding, int(row_y[-1]) + 2 * self.padding)
+        image = Image.new('RGBA', size, self.background)
+        for cell, tile in zip(cells, tiles):
+            image.alpha_composite(tile, (self.padding + int(column_x[cell.column]),
+                                         self.padding + int(row_y[cell.row])))
+        return image
+
+    def render_array(self, text: str, font_size: Optional[int] = None) -> np.ndarray:
+        """Render markup to an (H, W, 4) uint8 RGBA array."""
+        return np.asarray(self.render(text, font_size))
+
+    def _blend_weights(self, text, font_size, mode):
+        key = (text, font_size, mode)
+        if key != self._blend_key:
+            rgba = self.render_array(text, font_size).astype(np.uint32)
+            alpha = rgba[..., 3:]
+            rgb = rgba[..., :3]
+            if mode in ('BGR', 'BGRA'):
+                rgb = rgb[..., ::-1]
+            elif mode == 'L':
+                rgb = (rgb[..., :1] * 299 + rgb[..., 1:2] * 587 + rgb[..., 2:] * 114) // 1000
+            self._blend = ((rgb * alpha).astype(np.uint16), (255 - alpha).astype(np.uint16))
+            self._blend_key = key
+        return self._blend
+
+    def composite(self, frame, text: str, position: Tuple[int, int] = (5, 5), font_size: Optional[int] = None,
+                  inplace: bool = False):
+        """
+        Draw the overlay onto a frame with its top-left corner at `position` and return the result.
+
+        `frame` may be a PIL image, an RGB(A) or grayscale array, or a capture Frame, whose channel order
+        is taken from its mode. Arrays and Frames are copied unless `inplace` is set; ring-buffer frames
+        from a background capture must not be modified in place. The overlay is clipped to the frame.
+        """
+        if isinstance(frame, Image.Image):
+            result = frame if inplace else frame.copy()
+            overlay = self.render(text, font_size)
+            if result.mode == 'RGBA':
+                result.alpha_composite(overlay, position)
+            else:
+                result.paste(overlay.convert(result.mode), position, overlay)
+            return result
+
+        if isinstance(frame, Frame):
+            blended = self._composite_array(frame.image, text, position, font_size, frame.mode, inplace)
+            return frame._replace(image=blended)
+        array = np.asarray(frame)
+        mode = 'L' if array.ndim == 2 else 'RGB'
+        return self._composite_array(array, text, position, font_size, mode, inplace)
+
+    def _composite_array(self, array, text, position, font_size, mode, inplace):
+        result = array if inplace else array.copy()
+        premultiplied, inverse_alpha = self._blend_weights(text, font_size, mode)
+        # Clip the overlay rectangle to the frame on every side
+        x, y = position
+        top, left = max(-y, 0), max(-x, 0)
+        bottom = min(premultiplied.shape[0], result.shape[0] - y)
+        right = min(premultiplied.shape[1], result.shape[1] - x)
+        if bottom <= top or right <= left:
+            return result
+
+        region = result[y + top:y + bottom, x + left:x + right]
+        if region.ndim == 2:
+            region = region[..., None]
+        pixels = region[..., :premultiplied.shape[2]]
+        blended = pixels * inverse_alpha[top:bottom, left:right] + premultiplied[top:bottom, left:right]
+        pixels[...] = (blended + 127) // 255
+        return result
+
+
+def _benchmark(iterations=200):
+    """Time rendering and compositing a statistics overlay onto a 1280x720 frame."""
+    renderer = OverlayRenderer(font_size=12)
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    template = ("<color=lightgreen>Alchs:</color> <color=lightblue>{:>6.2f}/s</color> "
+                "<color=lightblue>{:>7.2f}/min</color>\n"
+                "<color=lightgreen>Total Alchs:</color> <color=lightblue>{:>4}/5000</color> "
+                "<color=orange>{:<4} alchs</color>\n")
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        renderer.render(template.format(i / 100, i * 0.6, i, 5000 - i))
+    render_ms = (time.perf_counter() - start) / iterations * 1000
+
+    text = template.format(1.23, 73.8, 100, 4900)
+    renderer.composite(frame, text)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        renderer.composite(frame, text)
+    composite_ms = (time.perf_counter() - start) / iterations * 1000
+    print(f"render (new text): {render_ms:.2f} ms, composite (same text): {composite_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.custom_logger import setup_logging
+from utils.template_matching import Box, PreparedFrame, PreparedTemplate, locate_many, to_array
+
+logger_manager = setup_logging(log_to_file=True)
+logger = logger_manager.get_logger(__name__)
+
+# Templates prepared once per worker process by _init_worker.
+_worker_templates: Dict[str, PreparedTemplate] = {}
+
+
+def _init_worker(arrays: Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]], grayscale: bool) -> None:
+    """Pool initializer: prepare every template once, so tasks only carry names and a frame reference."""
+    global _worker_templates
+    _worker_templates = {name: PreparedTemplate.from_arrays(array, grayscale, mask)
+                         for name, (array, mask) in arrays.items()}
+
+
+def _match_partition(shm_name: str, shape, dtype: str, grayscale: bool, names: List[str], confidence, method: str,
+                     levels: int, top_k: int) -> Dict[str, Optional[Box]]:
+    """Worker task: attach to the shared frame and locate the named templates in it."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frame = None
+    try:
+        frame = PreparedFrame(np.ndarray(shape, dtype=dtype, buffer=shm.buf), grayscale)
+        templates = {name: _worker_templates[name] for name in names}
+        return locate_many(templates, frame, confidence, method, levels=levels, top_k=top_k)
+    except BaseException as error:
+        # The frames of the traceback still reference the shared buffer, and close() would fail with a
+        # BufferError that hides this error
+        traceback.clear_frames(error.__traceback__)
+        raise
+    finally:
+        frame = None  # Release the view on the shared buffer before closing it
+        shm.close()
+
+
+class ParallelMatcher:
+    """
+    Match a set of templates on a persistent process pool, off the asyncio thread.
+
+    The pool is started once; its initializer prepares all templates in every worker. For each frame
+    the matching array is written to a shared memory block that workers attach to by name, so frames
+    are never pickled. The requested templates are split into one partition per worker, balanced by
+    template area, and the results are merged into one dict. The `locate*` coroutines await the pool,
+    so the event loop keeps running while the workers search.
+
+    Parameters:
+    - templates (dict): Template images or arrays keyed by name.
+    - workers (int): Number of worker processes. Defaults to the CPU count.
+    - method (str): Matching method passed to template_matching.locate. Default is 'auto'.
+    - grayscale (bool): Match in grayscale, like locate_on_screen. Default is True.
+    """
+
+    def __init__(self, templates: Dict[str, object], workers: Optional[int] = None, method: str = 'auto',
+                 grayscale: bool = True):
+        self.workers = workers or os.cpu_count() or 1
+        self.method = method
+        self.grayscale = grayscale
+        prepared = {name: template if isinstance(template, PreparedTemplate) else PreparedTemplate(template, grayscale)
+                    for name, template in templates.items()}
+        # Workers rebuild the templates from their array and alpha mask
+        arrays = {name: (np.ascontiguousarray(template.array), template.mask) for name, template in prepared.items()}
+        self._areas = {name: template.shape[0] * template.shape[1] for name, template in prepared.items()}
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(arrays, grayscale))
+        logger.info(f"Started {self.workers} matching workers for {len(arrays)} templates")
+
+    def partition(self, names: List[str]) -> List[List[str]]:
+        """Split template names into at most `workers` groups of similar total area, largest first."""
+        groups = [[] for _ in range(min(self.workers, len(names)))]
+        loads = [0] * len(groups)
+        for name in sorted(names, key=self._areas.__getitem__, reverse=True):
+            index = loads.index(min(loads))
+            groups[index].append(name)
+            loads[index] += self._areas[name]
+        return groups
+
+    async def locate_many(self, frame, confidence=0.5, names: Optional[List[str]] = None, levels: int = 1,
+                          top_k: int = 5) -> Dict[str, Optional[Box]]:
+        """
+        Locate the templates `names` (default: all) in `frame` on the pool.
+        `confidence` is a single threshold or a dict per name. Returns a dict of Box (or None) keyed by name.
+        """
+        names = list(self._areas) if names is None else list(names)
+        array = np.ascontiguousarray(to_array(frame, self.grayscale))
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        try:
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            loop = asyncio.get_running_loop()
+            tasks = [loop.run_in_executor(self._executor, _match_partition, shm.name, array.shape, array.dtype.str,
+                                          self.grayscale, group, confidence, self.method, levels, top_k)
+                     for group in self.partition(names)]
+            results = {}
+            for partial in await asyncio.gather(*tasks):
+                results.update(partial)
+            return results
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def locate(self, name: str, frame, confidence: float = 0.5, levels: int = 1,
+                     top_k: int = 5) -> Optional[Box]:
+        """Locate a single template on a worker. Returns a Box or None, like locate_on_screen."""
+        results = await self.locate_many(frame, confidence, [name], levels, top_k)
+        return results[name]
+
+    def close(self) -> None:
+        """Shut the worker pool down."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        logger.debug("Matching workers stopped")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,27 +1,127 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
 from io import BytesIO
 
-import mss
-import mss.tools
-import pygetwindow as gw
+import numpy as np
 from PIL import Image
 
+from utils.capture_backends import SESSION_MANIFEST, CaptureError, MssBackend
 from utils.custom_logger import setup_logging
 
-logger = setup_logging(log_to_file=False)
+logger_manager = setup_logging(log_to_file=False)
+logger = logger_manager.get_logger(__name__)
+
+# A captured frame: the pixel array plus when it was grabbed, a per-instance sequence number,
+# the screen position of its top-left corner and the channel mode of the array.
+Frame = namedtuple('Frame', ['image', 'timestamp', 'sequence', 'left', 'top', 'mode'])
+
+CHANNEL_MODES = ('BGRA', 'BGR', 'RGB', 'L')
+
+# A named region of interest, given as (x, y, width, height) offsets from the window corner named by
+# `anchor`: 'top-left', 'top-right', 'bottom-left' or 'bottom-right'.
+Region = namedtuple('Region', ['x', 'y', 'width', 'height', 'anchor'], defaults=['top-left'])
+
+# Approximate panel positions for the fixed-size classic client layout. Override or extend them per
+# instance with ScreenCapture.add_roi() for other layouts.
+DEFAULT_ROIS = {
+    'minimap': Region(519, 0, 246, 168),
+    'spellbook': Region(548, 205, 190, 262),
+    'inventory': Region(560, 208, 168, 252),  # Aligned to the 4x7 grid of 42x36 slots
+    'chatbox': Region(0, 338, 519, 165),
+}
+
+# ITU-R 601-2 luma weights in BGR order, matching PIL's convert('L').
+_LUMA_WEIGHTS_BGR = np.array([114, 587, 299], dtype=np.uint32)
+
+
+def bgra_to_mode(bgra, mode='BGRA', out=None):
+    """
+    Convert a BGRA pixel array to the requested channel mode.
+
+    'BGRA', 'BGR' and 'RGB' are returned as views over `bgra` when no `out` array is given, so
+    no pixels are copied. 'L' (grayscale) always computes a new array unless `out` is supplied.
+    """
+    if mode == 'BGRA':
+        converted = bgra
+    elif mode == 'BGR':
+        converted = bgra[..., :3]
+    elif mode == 'RGB':
+        converted = bgra[..., 2::-1]
+    elif mode == 'L':
+        luma = (bgra[..., :3] @ _LUMA_WEIGHTS_BGR + 500) // 1000
+        if out is None:
+            return luma.astype(np.uint8)
+        np.copyto(out, luma, casting='unsafe')
+        return out
+    else:
+        raise ValueError(f"Unsupported channel mode '{mode}'. Expected one of {CHANNEL_MODES}.")
+
+    if out is None:
+        return converted
+    np.copyto(out, converted)
+    return out
+
+
+def frame_to_image(frame):
+    """Convert a `Frame` to a PIL image ('RGB', or 'L' for grayscale frames) that owns its pixels."""
+    height, width = frame.image.shape[:2]
+    if frame.mode == 'L':
+        return Image.fromarray(frame.image, 'L').copy()
+    raw_mode = {'BGRA': 'BGRX', 'BGR': 'BGR', 'RGB': 'RGB'}[frame.mode]
+    img = Image.frombuffer('RGB', (width, height), np.ascontiguousarray(frame.image), 'raw', raw_mode, 0, 1)
+    return img.copy() if raw_mode == 'RGB' else img
 
 
 class ScreenCapture:
-    def __init__(self, app_name=None):
+    def __init__(self, app_name=None, geometry_ttl=1.0, backend=None):
         self.app_name = app_name
         self.window = None
-        self.sct = mss.mss()
+        self._backend = backend  # Defaults to a live MssBackend, created on first use
+        self.rois = dict(DEFAULT_ROIS)
+
+        # Window geometry is cached and re-queried after `geometry_ttl` seconds (None: only when invalidated)
+        self.geometry_ttl = geometry_ttl
+        self._geometry = None
+        self._geometry_time = 0.0
+        self._buffers = {}  # Preallocated output arrays keyed by channel mode
+        self._sequence = itertools.count(1)
+
+        # Background capture state, see start_background_capture()
+        self._capture_thread = None
+        self._stop_event = threading.Event()
+        self._frames = deque()
+        self._frames_lock = threading.Lock()
+        self._waiters = []
+        self.capture_errors = 0
         logger.debug("ScreenCapture instance created with app_name: %s", app_name)
         if app_name:
             self.set_application(app_name)
 
     def __del__(self):
-        self.sct.close()
-        logger.debug("mss instance closed")
+        self.stop_background_capture()
+        if self._backend is not None:
+            self._backend.close()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = MssBackend()
+        return self._backend
+
+    def set_backend(self, backend):
+        """Switch to another CaptureBackend, e.g. a ReplayBackend. The application must be set again afterwards."""
+        self.stop_background_capture()
+        if self._backend is not None:
+            self._backend.close()
+        self._backend = backend
+        self.window = None
+        self.invalidate_geometry()
+        logger.debug("Capture backend set to %s", type(backend).__name__)
 
     def set_application(self, app_name=None, interactive=False):
         if interactive:
@@ -29,10 +129,11 @@ class ScreenCapture:
         if app_name:
             self.app_name = app_name
             self.window = self._find_window()
+            self.invalidate_geometry()
             logger.debug("Application set to: %s", app_name)
 
     def _choose_window_interactively(self):
-        windows = gw.getAllTitles()
+        windows = self.backend.list_windows()
         if not windows:
             logger.error("No available windows found.")
             raise ValueError("No available windows found.")
@@ -50,17 +151,31 @@ class ScreenCapture:
             raise
 
     def _find_window(self):
-        windows = gw.getWindowsWithTitle(self.app_name)
-        if windows:
-            return windows[0]
+        window = self.backend.find_window(self.app_name)
+        if window:
+            return window
         else:
             logger.error("No window found with title containing '%s'", self.app_name)
             raise ValueError(f"No window found with title containing '{self.app_name}'")
 
-    def get_window_coordinates(self):
+    def invalidate_geometry(self):
+        """Drop the cached window geometry so the next capture queries the window again."""
+        self._geometry = None
+
+    def get_window_coordinates(self, refresh=False):
+        """
+        Return the window's screen coordinates. The result is cached and only re-queried when `refresh`
+        is set, the cache was invalidated, or it is older than `geometry_ttl` seconds.
+        """
         if not self.window:
             logger.error("No window set. Attempt to get coordinates failed.")
             raise ValueError("No window set. Please set the application first.")
+
+        now = time.monotonic()
+        expired = self.geometry_ttl is not None and now - self._geometry_time > self.geometry_ttl
+        if self._geometry is not None and not refresh and not expired:
+            return dict(self._geometry)
+
         coordinates = {
             "left": self.window.left,
             "top": self.window.top,
@@ -69,45 +184,261 @@ class ScreenCapture:
             "width": self.window.width,
             "height": self.window.height
         }
-        logger.debug("Window coordinates: %s", coordinates)
-        return coordinates
+        if coordinates != self._geometry:
+            logger.debug("Window coordinates: %s", coordinates)
+        self._geometry = coordinates
+        self._geometry_time = now
+        return dict(coordinates)
 
-    def capture_to_disk(self, output_path="screenshot.png"):
-        bbox = self.get_window_coordinates()
-        monitor = {
+    def add_roi(self, name, x, y, width, height, anchor='top-left'):
+        """Define (or redefine) a named region of interest relative to the window."""
+        if anchor not in ('top-left', 'top-right', 'bottom-left', 'bottom-right'):
+            raise ValueError(f"Invalid anchor '{anchor}'.")
+        self.rois[name] = Region(x, y, width, height, anchor)
+
+    def get_roi_bounds(self, name, refresh=False):
+        """
+        Resolve the named ROI against the current window geometry.
+        Returns the mss monitor dict of the region in screen coordinates, clipped to the window.
+        """
+        if name not in self.rois:
+            raise KeyError(f"Unknown ROI '{name}'. Known ROIs: {sorted(self.rois)}")
+        region = self.rois[name]
+        bbox = self.get_window_coordinates(refresh=refresh)
+
+        x = region.x if region.anchor.endswith('left') else bbox["width"] - region.x - region.width
+        y = region.y if region.anchor.startswith('top') else bbox["height"] - region.y - region.height
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + region.width, bbox["width"]), min(y + region.height, bbox["height"])
+        if right <= left or bottom <= top:
+            raise ValueError(f"ROI '{name}' lies outside the {bbox['width']}x{bbox['height']} window.")
+
+        return {
+            "top": bbox["top"] + top,
+            "left": bbox["left"] + left,
+            "width": right - left,
+            "height": bottom - top
+        }
+
+    def _monitor(self, roi=None, refresh=False):
+        if roi:
+            return self.get_roi_bounds(roi, refresh=refresh)
+        bbox = self.get_window_coordinates(refresh=refresh)
+        return {
             "top": bbox["top"],
             "left": bbox["left"],
             "width": bbox["width"],
             "height": bbox["height"]
         }
 
-        screenshot = self.sct.grab(monitor)
-        img = Image.frombytes('RGB', (screenshot.width, screenshot.height), screenshot.rgb)
-        img.save(output_path)
-        logger.info("Screenshot saved to %s", output_path)
-
-    def capture_to_memory(self):
+    def _grab(self, backend=None, roi=None):
+        """
+        Grab the raw BGRA screenshot of the current window, or only of the named ROI, using `backend` instead
+        of the instance's backend if given. A failed grab re-queries the window geometry and retries once.
+        """
         if not self.window:
             logger.error("No window set. Attempt to capture screen failed.")
             raise ValueError("No window set. Please set the application first.")
 
-        bbox = self.get_window_coordinates()
-        monitor = {
-            "top": bbox["top"],
-            "left": bbox["left"],
-            "width": bbox["width"],
-            "height": bbox["height"]
-        }
+        backend = backend or self.backend
+        try:
+            return backend.grab(self._monitor(roi))
+        except (CaptureError, ValueError) as e:
+            logger.warning("Capture of %s failed (%s), refreshing window geometry", roi or "window", e)
+            return backend.grab(self._monitor(roi, refresh=True))
 
-        screenshot = self.sct.grab(monitor)
-        img = Image.frombytes('RGB', (screenshot.width, screenshot.height), screenshot.rgb)
+    def _get_buffer(self, mode, shape):
+        """Return the reusable output buffer for `mode`, reallocating it if the frame size changed."""
+        buffer = self._buffers.get(mode)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._buffers[mode] = buffer
+            logger.debug("Allocated %s capture buffer with shape %s", mode, shape)
+        return buffer
+
+    def _to_array(self, screenshot, mode, out, reuse_buffer):
+        bgra = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+        if out is None and reuse_buffer:
+            shape = bgra.shape[:2] if mode == 'L' else bgra.shape[:2] + (len(mode),)
+            out = self._get_buffer(mode, shape)
+
+        return bgra_to_mode(bgra, mode, out=out)
+
+    def capture_to_array(self, mode='BGRA', out=None, reuse_buffer=False, roi=None):
+        """
+        Capture the window straight into a NumPy array, without any image encoding.
+
+        In 'BGRA' mode the result is a zero-copy view over the capture buffer; 'BGR' and 'RGB' are
+        strided views over the same memory. 'L' converts to grayscale. Pass `out`, or set
+        `reuse_buffer` to use a per-instance preallocated array, to receive a contiguous copy
+        instead of allocating a new array per frame. With `roi`, only that named region is grabbed.
+        """
+        return self._to_array(self._grab(roi=roi), mode, out, reuse_buffer and not roi)
+
+    def capture_frame(self, mode='BGRA', out=None, reuse_buffer=False, roi=None):
+        """
+        Capture the window, or only the named `roi`, as a `Frame` tagged with a timestamp and sequence number.
+        The frame's left/top give the captured region's screen position.
+        """
+        screenshot = self._grab(roi=roi)
+        image = self._to_array(screenshot, mode, out, reuse_buffer and not roi)
+        return Frame(image, time.perf_counter(), next(self._sequence), screenshot.left, screenshot.top, mode)
+
+    def capture_rois(self, names, mode='BGRA'):
+        """Capture several named ROIs. Returns a dict mapping each name to its `Frame`."""
+        return {name: self.capture_frame(mode, roi=name) for name in names}
+
+    def capture_to_image(self, roi=None):
+        """Capture the window, or only the named `roi`, as an RGB PIL image decoded directly from the BGRA buffer."""
+        screenshot = self._grab(roi=roi)
+        return Image.frombuffer('RGB', (screenshot.width, screenshot.height), screenshot.raw, 'raw', 'BGRX', 0, 1)
+
+    def capture_to_disk(self, output_path="screenshot.png"):
+        img = self.capture_to_image()
+        img.save(output_path)
+        logger.info("Screenshot saved to %s", output_path)
+
+    def capture_to_memory(self):
+        """Capture the window PNG-encoded into a BytesIO. Prefer `capture_to_array` unless bytes are needed."""
+        img = self.capture_to_image()
         img_bytes = BytesIO()
         img.save(img_bytes, format='PNG')
         img_bytes.seek(0)
-        logger.debug(f"Screenshot captured to memory: {img_bytes.tell()} bytes")
+        logger.debug("Screenshot captured to memory: %d bytes", img_bytes.getbuffer().nbytes)
 
         return img_bytes
 
+    def record_session(self, output_dir, num_frames, fps=10, roi=None):
+        """Record `num_frames` captures as PNGs plus a timing manifest, for playback with a ReplayBackend."""
+        os.makedirs(output_dir, exist_ok=True)
+        interval = 1.0 / fps
+        frames = []
+        start = time.perf_counter()
+        for index in range(num_frames):
+            captured_at = time.perf_counter()
+            file_name = f"frame_{index:05d}.png"
+            self.capture_to_image(roi=roi).save(os.path.join(output_dir, file_name))
+            frames.append({"file": file_name, "timestamp": captured_at - start})
+            time.sleep(max(0.0, captured_at + interval - time.perf_counter()))
+
+        with open(os.path.join(output_dir, SESSION_MANIFEST), 'w') as f:
+            json.dump({"app_name": self.app_name, "roi": roi, "frames": frames}, f, indent=2)
+        logger.info("Recorded %d frames to %s", num_frames, output_dir)
+
+    @property
+    def background_running(self):
+        return self._capture_thread is not None and self._capture_thread.is_alive()
+
+    def start_background_capture(self, fps=30, buffer_size=4, mode='BGRA', roi=None):
+        """
+        Start grabbing frames continuously on a dedicated thread.
+
+        Frames are written into `buffer_size` preallocated slots that are reused round-robin, so a
+        frame's array stays valid until `buffer_size` newer frames have been captured; copy it if it
+        must be kept longer. Read frames with `latest_frame()` or `await next_frame(after_seq)`.
+        With `roi`, only that named region is captured.
+        """
+        if self.background_running:
+            logger.warning("Background capture already running.")
+            return
+        if not self.window:
+            logger.error("No window set. Attempt to start background capture failed.")
+            raise ValueError("No window set. Please set the application first.")
+        if fps <= 0 or buffer_size < 1:
+            raise ValueError("fps must be positive and buffer_size at least 1.")
+
+        self._stop_event.clear()
+        with self._frames_lock:
+            self._frames = deque(maxlen=buffer_size)
+        self._capture_thread = threading.Thread(target=self._capture_loop, args=(1.0 / fps, buffer_size, mode, roi),
+                                                name=f"ScreenCapture-{self.app_name}", daemon=True)
+        self._capture_thread.start()
+        logger.debug("Background capture started at %s fps with %d buffers", fps, buffer_size)
+
+    def stop_background_capture(self, timeout=1.0):
+        """Stop the background capture thread, if running."""
+        thread = self._capture_thread
+        if thread is None:
+            return
+        self._stop_event.set()
+        thread.join(timeout)
+        self._capture_thread = None
+        logger.debug("Background capture stopped")
+
+    def latest_frame(self):
+        """Return the newest background frame without blocking, or None if none has been captured yet."""
+        with self._frames_lock:
+            return self._frames[-1] if self._frames else None
+
+    async def next_frame(self, after_seq=0, timeout=None):
+        """
+        Wait for a background frame with a sequence number greater than `after_seq`.
+
+        Returns immediately if the newest buffered frame is already newer. Raises asyncio.TimeoutError
+        if no such frame arrives within `timeout` seconds.
+        """
+        loop = asyncio.get_running_loop()
+        with self._frames_lock:
+            if self._frames and self._frames[-1].sequence > after_seq:
+                return self._frames[-1]
+            if not self.background_running:
+                raise RuntimeError("Background capture is not running. Call start_background_capture() first.")
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            return await asyncio.wait_for(waiter[1], timeout)
+        finally:
+            with self._frames_lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def _capture_loop(self, interval, buffer_size, mode, roi):
+        backend = self.backend.for_thread()
+        try:
+            slots = [None] * buffer_size
+            next_deadline = time.perf_counter()
+            for index in itertools.count():
+                if self._stop_event.is_set():
+                    break
+                try:
+                    screenshot = self._grab(backend, roi=roi)
+                    bgra = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height,
+                                                                                 screenshot.width, 4)
+                    shape = bgra.shape[:2] if mode == 'L' else bgra.shape[:2] + (len(mode),)
+                    slot = index % buffer_size
+                    if slots[slot] is None or slots[slot].shape != shape:
+                        slots[slot] = np.empty(shape, dtype=np.uint8)
+                    image = bgra_to_mode(bgra, mode, out=slots[slot])
+                    frame = Frame(image, time.perf_counter(), next(self._sequence), screenshot.left, screenshot.top,
+                                  mode)
+                    self._publish(frame)
+                except Exception as e:
+                    self.capture_errors += 1
+                    logger.error("Background capture failed: %s", e)
+
+                next_deadline = max(next_deadline + interval, time.perf_counter())
+                self._stop_event.wait(next_deadline - time.perf_counter())
+        finally:
+            if backend is not self._backend:
+                backend.close()
+
+    def _publish(self, frame):
+        with self._frames_lock:
+            self._frames.append(frame)
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve_future, future, frame)
+            except RuntimeError:
+                pass  # The waiting event loop has already been closed
+
+
+def _resolve_future(future, result):
+    if not future.done():
+        future.set_result(result)
+
 
 if __name__ == "__main__":
     # Example usage
@@ -117,6 +448,9 @@ if __name__ == "__main__":
         screen_capture.set_application(interactive=True)
         screen_capture.capture_to_disk("selected_window_screenshot.png")
 
+        frame = screen_capture.capture_frame(mode='RGB', reuse_buffer=True)  # Capture without PNG encoding
+        logger.info("Captured frame %d with shape %s", frame.sequence, frame.image.shape)
+
         img_bytes = screen_capture.capture_to_memory()  # Capture image to memory
         img = Image.open(img_bytes)  # Load the image from the BytesIO stream
 
@@ -0,0 +1,129 @@
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from utils.custom_logger import setup_logging
+from utils.template_matching import PreparedTemplate
+
+logger_manager = setup_logging(log_to_file=True)
+logger = logger_manager.get_logger(__name__)
+
+# Bumped whenever the stored arrays change meaning, so stale .npz files are re-prepared instead of loaded.
+# Version 2: masked templates are centered over their opaque pixels only.
+STORE_VERSION = 2
+
+
+class TemplateCache:
+    """
+    Cache of PreparedTemplates keyed by the content hash of their asset file.
+
+    Preparing a template (grayscale conversion, centering, statistics and alpha mask) is done once per
+    distinct file content. Prepared templates are kept in an in-memory LRU of at most `max_entries`, and
+    when `cache_dir` is set their matching array and mask are also stored there as .npz files. Files are
+    hashed again only when their mtime or size changes. FFT spectra are left to the 'fft' engine, which
+    computes them on first use; they are never stored, since the default OpenCV engine does not use them.
+
+    Parameters:
+    - max_entries (int): Number of prepared templates kept in memory. Default is 64.
+    - cache_dir (str): Directory for the on-disk store, or None (default) to keep templates in memory only.
+    - grayscale (bool): Prepare templates for grayscale matching, like locate_on_screen. Default is True.
+    """
+
+    def __init__(self, max_entries: int = 64, cache_dir: Optional[str] = None, grayscale: bool = True):
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.grayscale = grayscale
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries: 'OrderedDict[str, PreparedTemplate]' = OrderedDict()
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def content_hash(self, path) -> str:
+        """SHA-1 of the file contents, memoized on the file's mtime and size."""
+        path = os.fspath(path)
+        stat = os.stat(path)
+        memo = self._digests.get(path)
+        if memo and memo[:2] == (stat.st_mtime_ns, stat.st_size):
+            return memo[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self._digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _store_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npz"
+
+    def _key(self, digest: str) -> str:
+        return f"{digest}-{'gray' if self.grayscale else 'color'}-v{STORE_VERSION}"
+
+    def get(self, path) -> PreparedTemplate:
+        """Return the prepared template for the image at `path`, preparing it only if its content is new."""
+        key = self._key(self.content_hash(path))
+        template = self._entries.get(key)
+        if template is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return template
+
+        template = self._load(key)
+        if template is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            template = self._prepare(path)
+            self._save(key, template)
+
+        self._entries[key] = template
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return template
+
+    def load(self, paths: Dict[str, str]) -> Dict[str, PreparedTemplate]:
+        """Prepare every template of a name -> path mapping, such as load_assets()['items']."""
+        templates = {name: self.get(path) for name, path in paths.items()}
+        logger.debug(f"Template cache: {self.hits} hits, {self.disk_hits} from disk, {self.misses} prepared")
+        return templates
+
+    def _prepare(self, path) -> PreparedTemplate:
+        with Image.open(path) as img:
+            img = ImageOps.exif_transpose(img)
+            return PreparedTemplate(img, self.grayscale)
+
+    def _load(self, key: str) -> Optional[PreparedTemplate]:
+        if not self.cache_dir:
+            return None
+        store_path = self._store_path(key)
+        if not store_path.exists():
+            return None
+        try:
+            # Entries written by earlier versions may also hold spectra, which are not loaded
+            with np.load(store_path) as data:
+                mask = data['mask'] if 'mask' in data.files else None
+                return PreparedTemplate.from_arrays(data['array'], self.grayscale, mask)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable template cache entry {store_path}: {e}")
+            return None
+
+    def _save(self, key: str, template: PreparedTemplate) -> None:
+        if not self.cache_dir:
+            return
+        arrays = {'array': template.array}
+        if template.mask is not None:
+            arrays['mask'] = template.mask
+        # Write to a temporary file first so a crash never leaves a truncated entry behind
+        temp_path = self.cache_dir / f"{key}.tmp.npz"
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, self._store_path(key))
+
+    def clear(self) -> None:
+        """Drop the in-memory entries. The on-disk store is kept."""
+        self._entries.clear()
+        self._digests.clear()
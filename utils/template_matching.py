@@ -0,0 +1,596 @@
+import time
+from collections import namedtuple
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+except ImportError:  # OpenCV is optional, the NumPy implementation is used without it
+    cv2 = None
+
+# Same fields as pyscreeze.Box, so results are interchangeable with the old locate output.
+Box = namedtuple('Box', ['left', 'top', 'width', 'height'])
+
+# Templates with more pixels than this are correlated through the FFT by the NumPy engine.
+FFT_MIN_TEMPLATE_PIXELS = 64
+
+# ITU-R 601-2 luma weights, matching PIL's convert('L').
+_LUMA_WEIGHTS_RGB = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+# Pyramid search never shrinks a template below this many pixels per side.
+PYRAMID_MIN_TEMPLATE_SIZE = 8
+
+# locate_all keeps at most this many peaks before suppression, bounding the size of the IoU matrix.
+MAX_NMS_CANDIDATES = 256
+
+# non_max_suppression computes the IoU matrix this many rows at a time, so memory stays O(rows * N).
+_NMS_CHUNK_ROWS = 256
+
+# Windows whose (template * frame) energy is below this are flat and score 0 instead of dividing by ~0.
+_FLAT_EPSILON = 1e-3
+
+
+def to_array(image, grayscale: bool = True) -> np.ndarray:
+    """
+    Convert a PIL image or NumPy array to the layout used for matching: HxW when `grayscale` (the
+    default, as in pyscreeze), HxWx3 otherwise. An alpha channel is dropped and uint8 data is kept
+    as uint8. Color arrays are assumed to be in RGB order; pass 'L' captures for grayscale frames.
+    """
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert('L' if grayscale else 'RGB'))
+
+    array = np.asarray(image)
+    if array.ndim == 3:
+        array = array[..., :3]
+        if grayscale:
+            array = (array @ _LUMA_WEIGHTS_RGB).astype(np.float32)
+    return array
+
+
+def _next_fast_len(n: int) -> int:
+    """Smallest integer >= n whose only prime factors are 2, 3 and 5."""
+    best = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            quotient = -(-n // p35)
+            candidate = p35 << max((quotient - 1).bit_length(), 0)
+            if candidate == n:
+                return n
+            best = min(best, candidate)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def fft_shape_for(height: int, width: int) -> Tuple[int, int]:
+    """Padded FFT size used when matching against a frame of the given size."""
+    return _next_fast_len(height), _next_fast_len(width)
+
+
+def _window_sums(array: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Sum of every height x width window of a 2-D array, computed from an integral image."""
+    integral = np.zeros((array.shape[0] + 1, array.shape[1] + 1), dtype=np.float64)
+    np.cumsum(array, axis=0, dtype=np.float64, out=integral[1:, 1:])
+    np.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+    return (integral[height:, width:] - integral[:-height, width:]
+            - integral[height:, :-width] + integral[:-height, :-width])
+
+
+def _downsample(array: np.ndarray, factor: int) -> np.ndarray:
+    """Box-average an HxW or HxWxC array by an integer factor, dropping the incomplete edge blocks."""
+    height, width = array.shape[0] // factor, array.shape[1] // factor
+    blocks = array[:height * factor, :width * factor].reshape(height, factor, width, factor, *array.shape[2:])
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+def _local_maxima(scores: np.ndarray, radius: int = 1) -> np.ndarray:
+    """Boolean mask of positions that hold the maximum of their (2 * radius + 1)^2 neighbourhood."""
+    padded = np.pad(scores, radius, mode='constant', constant_values=-np.inf)
+    neighbourhood = scores.copy()
+    height, width = scores.shape
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            np.maximum(neighbourhood, padded[dy:dy + height, dx:dx + width], out=neighbourhood)
+    return scores >= neighbourhood
+
+
+def _top_peaks(scores: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Row and column indices of the `count` highest local maxima of a score map, best first."""
+    candidates = np.flatnonzero(_local_maxima(scores))
+    values = scores.ravel()[candidates]
+    if len(candidates) > count:
+        keep = np.argpartition(values, -count)[-count:]
+        candidates, values = candidates[keep], values[keep]
+    candidates = candidates[np.argsort(values)[::-1]]
+    return np.divmod(candidates, scores.shape[1])
+
+
+class PreparedFrame:
+    """
+    A frame converted once so that several templates can be matched against it.
+
+    Holds the matching array and lazily caches everything the NumPy engine derives from the frame
+    alone: the mean-centered float array, its FFT spectrum, and the per-window energy for each
+    template size. Pass it anywhere a frame is accepted.
+    """
+
+    def __init__(self, frame, grayscale: bool = True):
+        self.grayscale = grayscale
+        self.array = to_array(frame, grayscale)
+        self._centered = None
+        self._spectrum = None
+        self._squared_spectrum = None
+        self._energies = {}
+        self._pyramid = {}
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    def downsampled(self, factor: int) -> 'PreparedFrame':
+        """This frame box-averaged by `factor`, cached for pyramid searches."""
+        if factor not in self._pyramid:
+            self._pyramid[factor] = PreparedFrame(_downsample(self.array, factor), self.grayscale)
+        return self._pyramid[factor]
+
+    def centered(self) -> np.ndarray:
+        """Float32 frame with the per-channel mean removed, which improves FFT precision."""
+        if self._centered is None:
+            array = self.array.astype(np.float32)
+            self._centered = array - array.mean(axis=(0, 1))
+        return self._centered
+
+    def fft_shape(self) -> Tuple[int, int]:
+        return fft_shape_for(*self.shape[:2])
+
+    def spectrum(self) -> np.ndarray:
+        if self._spectrum is None:
+            self._spectrum = np.fft.rfft2(self.centered(), self.fft_shape(), axes=(0, 1))
+        return self._spectrum
+
+    def squared_spectrum(self) -> np.ndarray:
+        """Spectrum of the squared centered frame, used for the window energies of masked templates."""
+        if self._squared_spectrum is None:
+            centered = self.centered()
+            self._squared_spectrum = np.fft.rfft2(centered * centered, self.fft_shape(), axes=(0, 1))
+        return self._squared_spectrum
+
+    def window_energy(self, height: int, width: int) -> np.ndarray:
+        """Sum over channels of each window's squared deviation from its own mean."""
+        key = (height, width)
+        if key not in self._energies:
+            frame = self.centered()
+            pixels = height * width
+            channels = [frame] if frame.ndim == 2 else [frame[..., c] for c in range(frame.shape[2])]
+            energy = 0.0
+            for channel in channels:
+                sums = _window_sums(channel, height, width)
+                energy = energy + _window_sums(channel * channel, height, width) - sums * sums / pixels
+            self._energies[key] = np.maximum(energy, 0.0).astype(np.float32)
+        return self._energies[key]
+
+    def masked_window_energy(self, template: 'PreparedTemplate', method: str) -> np.ndarray:
+        """
+        Like `window_energy`, but over the opaque pixels of a masked template only: per channel,
+        sum(M * I^2) - sum(M * I)^2 / sum(M) for every window, with the sums correlated against the mask.
+        """
+        key = ('mask', id(template), method)
+        cached = self._energies.get(key)
+        if cached is not None and cached[0] is template:
+            return cached[1]
+        height, width = template.shape[:2]
+        frame = self.centered()
+        count = float(template.mask.sum())
+        if method == 'fft':
+            shape = self.fft_shape()
+            mask_spectrum = np.conj(template.mask_spectrum(shape))
+            if frame.ndim == 3:
+                mask_spectrum = mask_spectrum[..., None]
+            sums = np.fft.irfft2(self.spectrum() * mask_spectrum, shape, axes=(0, 1))
+            squares = np.fft.irfft2(self.squared_spectrum() * mask_spectrum, shape, axes=(0, 1))
+            sums = sums[:frame.shape[0] - height + 1, :frame.shape[1] - width + 1]
+            squares = squares[:frame.shape[0] - height + 1, :frame.shape[1] - width + 1]
+        else:
+            weights = template.mask.astype(np.float32)
+            sums = _correlate_array(frame, weights)
+            squares = _correlate_array(frame * frame, weights)
+        energy = squares - sums * sums / count
+        if energy.ndim == 3:
+            energy = energy.sum(axis=2)
+        energy = np.maximum(energy, 0.0).astype(np.float32)
+        self._energies[key] = (template, energy)
+        return energy
+
+
+class PreparedTemplate:
+    """
+    A template with its matching artifacts computed once: the matching array, the mean-centered
+    float array with its mean, standard deviation and energy, an alpha mask when the source image
+    has transparency, and FFT spectra per padded frame size (filled on demand). Pass it anywhere a
+    template is accepted; utils.template_cache.TemplateCache keeps them across searches and restarts.
+
+    With a mask, only the opaque pixels take part in matching, as with OpenCV's masked TM_CCOEFF_NORMED:
+    the mean, energy and centered array are computed over the mask, and `centered` is zero outside it.
+    """
+
+    def __init__(self, image, grayscale: bool = True):
+        self.grayscale = grayscale
+        self.mask = _alpha_mask(image)
+        self._set_array(to_array(image, grayscale))
+        self.spectra = {}
+
+    @classmethod
+    def from_arrays(cls, array: np.ndarray, grayscale: bool, mask: Optional[np.ndarray] = None,
+                    spectra: Optional[Dict[Tuple[int, int], np.ndarray]] = None) -> 'PreparedTemplate':
+        """Rebuild a prepared template from stored arrays."""
+        template = cls.__new__(cls)
+        template.grayscale = grayscale
+        template.mask = mask
+        template._set_array(array)
+        template.spectra = dict(spectra or {})
+        return template
+
+    def _set_array(self, array: np.ndarray) -> None:
+        self.array = array
+        values = array.astype(np.float32)
+        self._pyramid = {}
+        self._mask_spectra = {}
+        if self.mask is None:
+            self.mean = values.mean(axis=(0, 1))
+            self.centered = values - self.mean
+            self.std = float(self.centered.std())
+        else:
+            if self.mask.shape != array.shape[:2]:
+                raise ValueError(f"Mask of shape {self.mask.shape} does not match the template {array.shape[:2]}.")
+            weights = self.mask if values.ndim == 2 else self.mask[..., None]
+            self.mean = values[self.mask].mean(axis=0)
+            self.centered = np.where(weights, values - self.mean, np.float32(0.0)).astype(np.float32)
+            self.std = float(self.centered[self.mask].std())
+        self.energy = float((self.centered * self.centered).sum())
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    def downsampled(self, factor: int) -> 'PreparedTemplate':
+        """This template box-averaged by `factor`, cached for pyramid searches. The alpha mask is not carried over."""
+        if factor not in self._pyramid:
+            self._pyramid[factor] = PreparedTemplate.from_arrays(_downsample(self.array, factor), self.grayscale)
+        return self._pyramid[factor]
+
+    def spectrum(self, fft_shape: Tuple[int, int]) -> np.ndarray:
+        """FFT of the centered template zero-padded to `fft_shape` (see fft_shape_for), stored as complex64."""
+        fft_shape = tuple(fft_shape)
+        if fft_shape not in self.spectra:
+            # Same as rfft2 with padding, but the row transform only runs over the template's own rows
+            spectrum = np.fft.fft(np.fft.rfft(self.centered, fft_shape[1], axis=1), fft_shape[0], axis=0)
+            self.spectra[fft_shape] = spectrum.astype(np.complex64)
+        return self.spectra[fft_shape]
+
+    def mask_spectrum(self, fft_shape: Tuple[int, int]) -> np.ndarray:
+        """FFT of the alpha mask zero-padded to `fft_shape`, for masked window sums. Not persisted."""
+        fft_shape = tuple(fft_shape)
+        if fft_shape not in self._mask_spectra:
+            self._mask_spectra[fft_shape] = np.fft.rfft2(self.mask.astype(np.float32), fft_shape)
+        return self._mask_spectra[fft_shape]
+
+
+def _alpha_mask(image) -> Optional[np.ndarray]:
+    """Boolean mask of the opaque pixels of a PIL image, or None if it is fully opaque."""
+    if not isinstance(image, Image.Image):
+        return None
+    if image.mode == 'P' and 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if 'A' not in image.getbands():
+        return None
+    mask = np.asarray(image.getchannel('A')) > 0
+    return None if mask.all() else mask
+
+
+def _prepare_template(template, grayscale: bool) -> PreparedTemplate:
+    if isinstance(template, PreparedTemplate):
+        if template.grayscale != grayscale:
+            raise ValueError("Template was prepared for a different color mode than the frame.")
+        return template
+    return PreparedTemplate(template, grayscale)
+
+
+def _correlate_array(array: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Valid-mode correlation of each channel of `array` with a 2-D weight kernel, skipping zero weights."""
+    height, width = weights.shape
+    out_height, out_width = array.shape[0] - height + 1, array.shape[1] - width + 1
+    result = np.zeros((out_height, out_width, *array.shape[2:]), dtype=np.float64)
+    for y, x in zip(*np.nonzero(weights)):
+        result += array[y:y + out_height, x:x + out_width] * weights[y, x]
+    return result
+
+
+def _correlate_direct(frame: PreparedFrame, template: PreparedTemplate) -> np.ndarray:
+    """Valid-mode cross-correlation by accumulating one shifted frame slice per template pixel."""
+    array = frame.centered()
+    height, width = template.shape[:2]
+    out_height, out_width = array.shape[0] - height + 1, array.shape[1] - width + 1
+    result = np.zeros((out_height, out_width), dtype=np.float64)
+    for y in range(height):
+        for x in range(width):
+            window = array[y:y + out_height, x:x + out_width]
+            if array.ndim == 3:
+                result += window @ template.centered[y, x]
+            else:
+                result += window * template.centered[y, x]
+    return result
+
+
+def _correlate_fft(frame: PreparedFrame, template: PreparedTemplate) -> np.ndarray:
+    """Valid-mode cross-correlation through real FFTs, summed over channels. Both spectra are reused."""
+    height, width = template.shape[:2]
+    shape = frame.fft_shape()
+    product = frame.spectrum() * np.conj(template.spectrum(shape))
+    if product.ndim == 3:
+        product = product.sum(axis=2)
+    correlation = np.fft.irfft2(product, shape)
+    return correlation[:frame.shape[0] - height + 1, :frame.shape[1] - width + 1]
+
+
+def match_template(frame, template, method: str = 'auto', grayscale: bool = True) -> np.ndarray:
+    """
+    Normalized cross-correlation score map of `template` over every position of `frame`.
+
+    Scores match OpenCV's TM_CCOEFF_NORMED, which is what pyscreeze's `confidence` is compared against:
+    1.0 is a perfect match. Images are matched in grayscale by default, like pyscreeze; with
+    `grayscale=False` color images are correlated across all channels. Templates with transparency
+    (see PreparedTemplate.mask) are matched on their opaque pixels only, like the masked OpenCV mode.
+    Inputs are converted with `to_array`; pass a PreparedFrame and PreparedTemplate to avoid repeating that work.
+
+    Parameters:
+    - frame: Image, array or PreparedFrame to search in.
+    - template: Image, array or PreparedTemplate to search for. Must not be larger than `frame`.
+    - method (str): 'opencv', 'fft', 'direct', or 'auto' (default), which uses OpenCV when available and
+      otherwise picks FFT correlation for templates above FFT_MIN_TEMPLATE_PIXELS.
+    - grayscale (bool): Convert color inputs to grayscale before matching. Ignored for a PreparedFrame,
+      which was converted already. Default is True.
+
+    Returns:
+    - np.ndarray: float32 scores of shape (frame_height - template_height + 1, frame_width - template_width + 1).
+    """
+    if not isinstance(frame, PreparedFrame):
+        frame = PreparedFrame(frame, grayscale)
+    template = _prepare_template(template, frame.grayscale)
+    if frame.array.ndim != template.array.ndim:
+        raise ValueError("Frame and template must both be grayscale or both be color.")
+    height, width = template.shape[:2]
+    if height > frame.shape[0] or width > frame.shape[1]:
+        raise ValueError(f"Template of size {width}x{height} is larger than the "
+                         f"{frame.shape[1]}x{frame.shape[0]} frame.")
+
+    if method == 'auto':
+        if cv2 is not None:
+            method = 'opencv'
+        else:
+            method = 'fft' if height * width > FFT_MIN_TEMPLATE_PIXELS else 'direct'
+    if method == 'opencv':
+        array, template_array = frame.array, template.array
+        if array.dtype != template_array.dtype or array.dtype not in (np.uint8, np.float32):
+            array, template_array = array.astype(np.float32), template_array.astype(np.float32)
+        if template.mask is None:
+            return cv2.matchTemplate(np.ascontiguousarray(array), np.ascontiguousarray(template_array),
+                                     cv2.TM_CCOEFF_NORMED)
+        scores = cv2.matchTemplate(np.ascontiguousarray(array), np.ascontiguousarray(template_array),
+                                   cv2.TM_CCOEFF_NORMED, mask=template.mask.astype(np.uint8))
+        # Flat windows divide by zero in OpenCV's masked mode; score them 0 like the NumPy engines
+        return np.clip(np.nan_to_num(scores, nan=0.0, posinf=0.0, neginf=0.0), -1.0, 1.0, out=scores)
+
+    if method == 'fft':
+        numerator = _correlate_fft(frame, template)
+    elif method == 'direct':
+        numerator = _correlate_direct(frame, template)
+    else:
+        raise ValueError(f"Unknown matching method '{method}'.")
+
+    if template.mask is None:
+        energy, pixels = frame.window_energy(height, width), height * width
+    else:
+        energy, pixels = frame.masked_window_energy(template, method), int(template.mask.sum())
+    denominator = np.sqrt(energy * np.float32(template.energy))
+    scores = np.zeros(denominator.shape, dtype=np.float32)
+    np.divide(numerator, denominator, out=scores, where=denominator >= _FLAT_EPSILON * pixels)
+    return np.clip(scores, -1.0, 1.0, out=scores)
+
+
+def best_match(scores: np.ndarray) -> Tuple[int, int, float]:
+    """Return (x, y, score) of the highest value in a score map."""
+    index = int(np.argmax(scores))
+    y, x = divmod(index, scores.shape[1])
+    return x, y, float(scores[y, x])
+
+
+def locate(template, frame, confidence: float = 0.5, method: str = 'auto', grayscale: bool = True,
+           levels: int = 1, top_k: int = 5) -> Optional[Box]:
+    """
+    Return the Box of the best match of `template` in `frame` if its score exceeds `confidence`, else None.
+    A template larger than the frame never matches. `frame` and `template` may be prepared already.
+
+    With `levels` > 1 a coarse-to-fine pyramid search is used: frame and template are box-averaged by
+    2 ** (levels - 1), the `top_k` best peaks of that coarse match are refined at full resolution, and
+    the best refined window wins. Refined scores are full-resolution scores, so `confidence` keeps its
+    meaning; a match is only missed when it does not rank among the coarse top_k.
+    """
+    if not isinstance(frame, PreparedFrame):
+        frame = PreparedFrame(frame, grayscale)
+    template = _prepare_template(template, frame.grayscale)
+    height, width = template.shape[:2]
+    if height > frame.shape[0] or width > frame.shape[1]:
+        return None
+    if levels > 1:
+        x, y, score = _pyramid_match(frame, template, method, levels, top_k)
+    else:
+        x, y, score = best_match(match_template(frame, template, method))
+    return Box(x, y, width, height) if score > confidence else None
+
+
+def _pyramid_match(frame: PreparedFrame, template: PreparedTemplate, method: str, levels: int,
+                   top_k: int) -> Tuple[int, int, float]:
+    """Best (x, y, score) found by refining the top_k peaks of a downsampled match at full resolution."""
+    height, width = template.shape[:2]
+    factor = 2 ** (levels - 1)
+    while factor > 1 and min(height, width) // factor < PYRAMID_MIN_TEMPLATE_SIZE:
+        factor //= 2
+    if factor == 1:
+        return best_match(match_template(frame, template, method))
+
+    coarse = match_template(frame.downsampled(factor), template.downsampled(factor), method)
+    rows, cols = _top_peaks(coarse, top_k)
+
+    # A coarse peak at (col, row) covers full-resolution offsets within one block of (col, row) * factor
+    best = (0, 0, -1.0)
+    max_y, max_x = frame.shape[0] - height, frame.shape[1] - width
+    for row, col in zip(rows, cols):
+        top, left = max(int(row) * factor - factor, 0), max(int(col) * factor - factor, 0)
+        bottom, right = min(int(row) * factor + factor, max_y), min(int(col) * factor + factor, max_x)
+        window = frame.array[top:bottom + height, left:right + width]
+        x, y, score = best_match(match_template(window, template, method, frame.grayscale))
+        if score > best[2]:
+            best = (left + x, top + y, score)
+    return best
+
+
+def locate_many(templates: Dict[str, object], frame, confidence=0.5, method: str = 'auto',
+                grayscale: bool = True, levels: int = 1, top_k: int = 5) -> Dict[str, Optional[Box]]:
+    """
+    Locate several templates in one frame, preparing the frame only once.
+
+    This is a loop over `locate` that converts the frame a single time. With the OpenCV engine that
+    conversion is all that is shared: every template is still a full matchTemplate call, so the cost
+    grows linearly with the number of templates. The fft engine also reuses the frame's spectrum for
+    every template, and its window statistics for templates of the same size.
+
+    Parameters:
+    - templates (dict): Template images or arrays keyed by name.
+    - frame: Image, array or PreparedFrame to search in.
+    - confidence (float or dict): Threshold for all templates, or per template name.
+    - levels, top_k: Pyramid search settings, see `locate`. The downsampled frame is shared as well.
+
+    Returns:
+    - dict: The Box (or None) of each template, keyed by name.
+    """
+    prepared = frame if isinstance(frame, PreparedFrame) else PreparedFrame(frame, grayscale)
+    results = {}
+    for name, template in templates.items():
+        threshold = confidence[name] if isinstance(confidence, dict) else confidence
+        results[name] = locate(template, prepared, threshold, method, levels=levels, top_k=top_k)
+    return results
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, overlap: float = 0.3) -> np.ndarray:
+    """
+    Indices of the boxes kept by matrix ("fast") non-maximum suppression, best score first.
+
+    Boxes are (left, top, width, height) rows. The pairwise IoU matrix is computed in blocks of
+    _NMS_CHUNK_ROWS rows and a box is dropped when it overlaps any higher-scoring box by more than
+    `overlap`, so there is no per-box loop. Unlike greedy NMS, an already suppressed box can still
+    suppress others, which only matters for chains of overlapping matches.
+    """
+    order = np.argsort(scores)[::-1]
+    boxes = boxes[order].astype(np.float64)
+    left, top = boxes[:, 0], boxes[:, 1]
+    right, bottom = left + boxes[:, 2], top + boxes[:, 3]
+    area = boxes[:, 2] * boxes[:, 3]
+    max_overlap = np.zeros(len(boxes))
+    for start in range(0, len(boxes), _NMS_CHUNK_ROWS):
+        rows = slice(start, start + _NMS_CHUNK_ROWS)
+        inter_width = np.clip(np.minimum(right[rows, None], right) - np.maximum(left[rows, None], left), 0, None)
+        inter_height = np.clip(np.minimum(bottom[rows, None], bottom) - np.maximum(top[rows, None], top), 0, None)
+        intersection = inter_width * inter_height
+        iou = intersection / (area[rows, None] + area - intersection)
+        # Row i suppresses column j only if i scores higher, i.e. the strict upper triangle
+        np.maximum(max_overlap, np.triu(iou, k=1 + start).max(axis=0, initial=0.0), out=max_overlap)
+    return order[max_overlap <= overlap]
+
+
+def locate_all(template, frame, confidence: float = 0.5, overlap: float = 0.3, method: str = 'auto',
+               grayscale: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Locate every instance of `template` in `frame` from a single score map.
+
+    Local maxima scoring above `confidence` become candidate boxes, which are filtered with
+    non_max_suppression so overlapping detections of one instance collapse into the best one.
+
+    Parameters:
+    - template: Image, array or PreparedTemplate to search for.
+    - frame: Image, array or PreparedFrame to search in.
+    - confidence (float): Minimum score of a match, as in `locate`. Default is 0.5.
+    - overlap (float): IoU above which the weaker of two matches is dropped. Default is 0.3.
+
+    Returns:
+    - tuple: (boxes, scores), an int (N, 4) array of (left, top, width, height) rows and their float32
+      scores, sorted by descending score. Both are empty when nothing matches.
+    """
+    if not isinstance(frame, PreparedFrame):
+        frame = PreparedFrame(frame, grayscale)
+    template = _prepare_template(template, frame.grayscale)
+    height, width = template.shape[:2]
+    if height > frame.shape[0] or width > frame.shape[1]:
+        return np.empty((0, 4), dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    scores = match_template(frame, template, method)
+    peaks = np.flatnonzero((scores > confidence) & _local_maxima(scores))
+    peak_scores = scores.ravel()[peaks]
+    if len(peaks) > MAX_NMS_CANDIDATES:
+        keep = np.argpartition(peak_scores, -MAX_NMS_CANDIDATES)[-MAX_NMS_CANDIDATES:]
+        peaks, peak_scores = peaks[keep], peak_scores[keep]
+
+    rows, cols = np.divmod(peaks, scores.shape[1])
+    boxes = np.column_stack([cols, rows, np.full_like(cols, width), np.full_like(rows, height)])
+    keep = non_max_suppression(boxes, peak_scores, overlap)
+    return boxes[keep], peak_scores[keep]
+
+
+def _benchmark(repeats: int = 5):
+    """Compare this engine against pyscreeze.locate on the shipped item sprites."""
+    from utils.assets_path_loader import load_assets
+
+    sprites = {name: Image.open(path).convert('RGB') for name, path in load_assets()['items'].items()}
+    rng = np.random.default_rng(0)
+    screen = Image.fromarray(rng.integers(0, 256, (720, 1280, 3), dtype=np.uint8))
+    x = 0
+    for sprite in sprites.values():
+        screen.paste(sprite, (x, 300))
+        x += sprite.width + 8
+
+    engines = {'fft': lambda t, s: locate(t, s, 0.9, method='fft'),
+               'fft/pyr3': lambda t, s: locate(t, s, 0.9, method='fft', levels=3)}
+    if cv2 is not None:
+        engines['opencv'] = lambda t, s: locate(t, s, 0.9, method='opencv')
+        engines['opencv/pyr3'] = lambda t, s: locate(t, s, 0.9, method='opencv', levels=3)
+    try:
+        from pyscreeze import locate as pyscreeze_locate
+        engines['pyscreeze'] = lambda t, s: pyscreeze_locate(t, s, confidence=0.9)
+    except ImportError:
+        pass
+
+    # The engines here take preconverted arrays; pyscreeze converts both images on every call
+    screen_array = to_array(screen)
+    arrays = {name: to_array(sprite) for name, sprite in sprites.items()}
+    for engine, run in engines.items():
+        preconverted = engine != 'pyscreeze'
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for name, sprite in sprites.items():
+                run(arrays[name] if preconverted else sprite, screen_array if preconverted else screen)
+        per_search = (time.perf_counter() - start) / (repeats * len(sprites))
+        print(f"{engine:>12}: {1000 * per_search:7.2f} ms per search")
+
+    for engine in ('fft', 'opencv') if cv2 is not None else ('fft',):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            locate_many(arrays, screen_array, 0.9, method=engine)
+        per_call = (time.perf_counter() - start) / repeats
+        print(f"{engine:>12}: {1000 * per_call:7.2f} ms for locate_many over all {len(sprites)} sprites")
+
+
+if __name__ == '__main__':
+    _benchmark()
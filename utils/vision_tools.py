@@ -1,72 +1,353 @@
+import asyncio
+import logging
+import random
 import time
-import pyautogui
+from contextlib import nullcontext
+import numpy as np
 from PIL import Image
-from pyscreeze import locate, ImageNotFoundException, USE_IMAGE_NOT_FOUND_EXCEPTION
-from utils.custom_logger import setup_logging
+from utils.change_detection import ChangeDetector
+from utils.custom_logger import log_every_n, setup_logging
+from utils.debug_sink import DebugSink
+from utils.screen_capture import bgra_to_mode
+from utils.template_matching import (Box, PreparedFrame, PreparedTemplate, best_match, locate, locate_all,
+                                     locate_many, match_template, to_array)
 
-logger = setup_logging(log_to_file=True)
+logger_manager = setup_logging(log_to_file=True)
+logger = logger_manager.get_logger(__name__)
 
+# Receives the artifacts of save_debug_info, and is shared by scripts so one set of sampling settings applies.
+# Its writer thread only starts once something is queued. Successful searches are sampled every 10th
+# iteration, failures are always kept.
+debug_sink = DebugSink('screenshots', every_n=10)
 
-def locate_on_screen(image, screen, minSearchTime=0, debug=False, iteration=None, confidence=0.5):
-    """Locate an image on the screen with enhanced logging for debugging purposes."""
+
+def locate_on_screen(image, screen, minSearchTime=0, debug=False, iteration=None, confidence=0.5, levels=1,
+                     top_k=5):
+    """
+    Locate an image on the screen with enhanced logging for debugging purposes.
+    Accepts PIL images, arrays or a PreparedTemplate (see utils.template_cache) and returns a Box or None.
+    With `levels` > 1 a coarse-to-fine pyramid search refining the `top_k` best coarse candidates is used
+    (see template_matching.locate); scores are still full-resolution, so thresholds are unchanged.
+
+    The screen is searched exactly once. `minSearchTime` is kept for compatibility and ignored: searching
+    the same screen again cannot find anything new, use `wait_for_template` to wait for new frames.
+    """
     start = time.time()
-    elapsed_time = 0
-    logger.info(f"Starting locate_on_screen with minSearchTime={minSearchTime}, debug={debug}, iteration={iteration}")
-    logger.debug(f"Image size: {image.size}, Screen size: {screen.size}")
+    logger.info("Starting locate_on_screen with debug=%s, iteration=%s", debug, iteration)
+    if minSearchTime:
+        logger.debug("minSearchTime is ignored, use wait_for_template to wait for the image to appear.")
 
     try:
-        while True:
-            try:
-                retVal = locate(image, screen, confidence=confidence)
-                elapsed_time = time.time() - start
-                logger.debug(f"Time elapsed: {elapsed_time:.2f} seconds")
-
-                if retVal:
-                    logger.info(f"Found image at {retVal} after {elapsed_time:.2f} seconds")
-                    if debug:
-                        save_debug_info(image, screen, iteration)
-                    return retVal
-                elif elapsed_time > minSearchTime:
-                    logger.info(f"No match found within the minimum search time of {minSearchTime} seconds.")
-                    if debug:
-                        save_debug_info(image, screen, iteration, "No match found")
-                    return None
-            except ImageNotFoundException as e:
-                logger.warning(f"ImageNotFoundException: {e}")
-                break
-                if elapsed_time > minSearchTime:
-                    if USE_IMAGE_NOT_FOUND_EXCEPTION:
-                        logger.error("Raising ImageNotFoundException due to configuration.")
-                        if debug:
-                            save_debug_info(image, screen, iteration, str(e))
-                        raise
-                    else:
-                        if debug:
-                            save_debug_info(image, screen, iteration, str(e))
-                        return None
+        template = image if isinstance(image, PreparedTemplate) else PreparedTemplate(image)
+        haystack = PreparedFrame(screen)
+        logger.debug("Image size: %s, Screen size: %s", template.shape[1::-1], haystack.shape[1::-1])
+
+        retVal = locate(template, haystack, confidence=confidence, levels=levels, top_k=top_k)
+        elapsed_time = time.time() - start
+        if retVal:
+            logger.info("Found image at %s after %.2f seconds", retVal, elapsed_time)
+            if debug:
+                save_debug_info(image, screen, iteration)
+        else:
+            logger.info("No match found after %.2f seconds.", elapsed_time)
+            if debug:
+                save_debug_info(image, screen, iteration, "No match found")
+        return retVal
 
     except Exception as e:
         elapsed_time = time.time() - start
-        logger.error(f"An exception occurred after {elapsed_time:.2f} seconds: {e}")
+        logger.error("An exception occurred after %.2f seconds: %s", elapsed_time, e)
         if debug:
             save_debug_info(image, screen, iteration, str(e))
         raise
 
 
-def save_debug_info(image, screen, iteration=None, error_message=None):
-    """Save debug information including the source image, the screen, and an error message if any."""
-    iteration_str = f"_{iteration}" if iteration is not None else ""
-    image_path = f"screenshots/debug_source_image{iteration_str}.png"
-    screen_path = f"screenshots/debug_screen{iteration_str}.png"
+def _crop_frame(frame, screen_capture, roi):
+    """Crop a captured Frame to the named `roi`, keeping left/top at the crop's screen position."""
+    if not roi:
+        return frame
+    image = frame.image
+    bounds = screen_capture.get_roi_bounds(roi)
+    left, top = bounds["left"] - frame.left, bounds["top"] - frame.top
+    if left < 0 or top < 0 or left + bounds["width"] > image.shape[1] or top + bounds["height"] > image.shape[0]:
+        raise ValueError(f"ROI '{roi}' is not inside the captured frames.")
+    image = image[top:top + bounds["height"], left:left + bounds["width"]]
+    return frame._replace(image=image, left=bounds["left"], top=bounds["top"])
+
+
+def _detach(frame):
+    """Copy a Frame's image, so it stays valid once the capture reuses its ring-buffer slot."""
+    return None if frame is None else frame._replace(image=frame.image.copy())
+
+
+def _gray_frame(frame):
+    """Grayscale array of a captured Frame."""
+    if frame.mode == 'L':
+        return frame.image
+    if frame.mode == 'RGB':
+        return to_array(frame.image)
+    return bgra_to_mode(frame.image, 'L')  # BGRA and BGR
+
+
+async def wait_for_template(template, screen_capture, timeout=None, roi=None, confidence=0.5, locate=locate_on_screen,
+                            detector=None, max_interval=0.25, pipeline=None, with_frame=False):
+    """
+    Wait until `template` appears on screen, searching only when the watched region has changed.
+
+    Frames come from the ScreenCapture background thread when it is running (see `next_frame`), and are
+    otherwise grabbed inline. Searches go through a LocateCache, so every frame is fed to a ChangeDetector
+    and the template is only searched for in the first frame and in frames where the region changed.
+    While the region stays unchanged the wait between frames doubles, up to `max_interval` seconds; any
+    change resets it. CPU use therefore follows screen activity rather than wall time.
+
+    Parameters:
+    - template: Image, array or PreparedTemplate to wait for.
+    - screen_capture (ScreenCapture): Capture with the target window set.
+    - timeout (float): Seconds to wait. None waits indefinitely. At least one frame is always searched,
+      so a timeout of 0 checks the current screen once.
+    - roi (str): Named ScreenCapture ROI to watch and search. Defaults to the whole captured frame.
+    - confidence (float): Minimum match score. Default is 0.5.
+    - locate: Search function with the signature of locate_on_screen, e.g. LocationPrior().locate.
+    - detector (ChangeDetector): Detector to use. Defaults to a new one with default settings.
+    - max_interval (float): Upper bound for the wait between frames of an unchanged region. Default is 0.25.
+    - pipeline (FramePipeline): If given, every frame is timed through its 'capture', 'preprocess' and
+      'locate' stages and passed to its `record`. Default is None.
+    - with_frame (bool): Also return the searched Frame. Default is False.
+
+    Returns:
+    - Box or None: The match, relative to `roi` (or to the captured frame), or None if `timeout` expired.
+      With `with_frame`, a tuple of the match and the last searched Frame (None if no frame arrived). The
+      Frame holds a copy of the searched region, and its left/top are that region's screen position, so
+      the match is at (frame.left + box.left, frame.top + box.top) on screen.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    cache = LocateCache(detector, key=f"wait:{roi or 'frame'}", search=locate)
+    cache.clear()
+    if not isinstance(template, PreparedTemplate):
+        template = PreparedTemplate(template)
+
+    sequence = 0
+    interval = 0.0
+    frames = 0
+    searched = None
+    stage = pipeline.stage if pipeline else lambda name: nullcontext()
+    start = loop.time()
+    while True:
+        remaining = None if deadline is None else max(deadline - loop.time(), 0.0)
+        if pipeline:
+            pipeline.start_frame()
+        with stage('capture'):
+            if screen_capture.background_running:
+                try:
+                    # Always allow a short wait so a timeout of 0 still sees one frame
+                    frame = await screen_capture.next_frame(sequence,
+                                                            None if remaining is None else max(remaining, 0.1))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                frame = screen_capture.capture_frame(mode='L', roi=roi)
+        sequence = frame.sequence
+        frames += 1
+
+        with stage('preprocess'):
+            searched = _crop_frame(frame, screen_capture, roi if screen_capture.background_running else None)
+            screen = _gray_frame(searched)
+        with stage('locate'):
+            result = cache.locate(template, screen, confidence=confidence)
+        if pipeline:
+            pipeline.record(screen)
+        if result:
+            logger.debug("wait_for_template found a match after %.2fs (%d frames, %d searches)",
+                         loop.time() - start, frames, cache.misses)
+            return (result, _detach(searched)) if with_frame else result
+        if cache.last_dirty_regions:
+            interval = 0.0
+        else:
+            interval = min(max(2 * interval, 0.01), max_interval)
+
+        if deadline is not None and loop.time() >= deadline:
+            break
+        delay = interval if deadline is None else min(interval, deadline - loop.time())
+        if delay > 0 or not screen_capture.background_running:
+            await asyncio.sleep(max(delay, 0.0))
+
+    logger.info("wait_for_template timed out after %.2fs (%d frames, %d searches)", loop.time() - start, frames,
+                cache.misses)
+    return (None, _detach(searched)) if with_frame else None
+
+
+def locate_many_on_screen(images, screen, confidence=0.5, levels=1, top_k=5):
+    """
+    Locate several images on the same screen, converting the screen only once (see template_matching.locate_many).
+    `images` maps names to images; `confidence` is a single threshold or a dict per name.
+    Returns a dict mapping each name to its Box, or None if it was not found.
+    """
+    start = time.time()
+    results = locate_many(images, PreparedFrame(screen), confidence=confidence, levels=levels, top_k=top_k)
+    found = sum(result is not None for result in results.values())
+    logger.info("Located %d/%d images in %.2f seconds", found, len(results), time.time() - start)
+    return results
+
+
+def locate_all_on_screen(image, screen, confidence=0.5, overlap=0.3):
+    """
+    Locate every instance of an image on the screen, e.g. to count the remaining items in the inventory.
+    Matches overlapping by more than `overlap` (IoU) are merged into the best one.
+    Returns (boxes, scores): an (N, 4) array of (left, top, width, height) rows and their scores, best first.
+    """
+    start = time.time()
+    boxes, scores = locate_all(image, screen, confidence=confidence, overlap=overlap)
+    logger.info("Located %d instances in %.2f seconds", len(boxes), time.time() - start)
+    return boxes, scores
 
-    # image.save(image_path)
-    # screen.save(screen_path)
 
-    logger.info(f"Saved source image to {image_path}")
-    logger.info(f"Saved screen capture to {screen_path}")
+def get_random_offset_position(x, y, offset_range=3):
+    """Generate a random offset position around a given x, y coordinate."""
+    offset_x = random.randint(-offset_range, offset_range)
+    offset_y = random.randint(-offset_range, offset_range)
+    return x + offset_x, y + offset_y
+
+
+def click_location(location, offset_range=3):
+    """Return a random click location near the center of a located Box."""
+    center_x = location.left + location.width // 2
+    center_y = location.top + location.height // 2
+    return get_random_offset_position(center_x, center_y, offset_range)
+
+
+class LocateCache:
+    """
+    Serve locate_on_screen results from a cache while the searched screen has not changed.
+
+    Every screen passed to `locate` is fed to a ChangeDetector under `key` (the whole window, or the ROI
+    name), and a cached result is reused until a block of that stream changes. Screens are compared by
+    content, so capture paths that hand back the same reused buffer every frame are handled correctly.
+    `locate` is a drop-in replacement for locate_on_screen, so it can be passed wherever a locate function
+    is expected. Searches that do run go through `search`, which defaults to locate_on_screen (e.g. pass
+    LocationPrior().locate).
+    """
+
+    def __init__(self, detector=None, key='window', search=locate_on_screen):
+        self.detector = detector or ChangeDetector()
+        self.key = key
+        self.search = search
+        self.hits = 0
+        self.misses = 0
+        self.last_dirty_regions = []
+        self._results = {}
+
+    def observe(self, screen):
+        """Feed a new screen to the change detector. Returns the dirty regions since the previous screen."""
+        self.last_dirty_regions = self.detector.update(screen, self.key)
+        if self.last_dirty_regions:
+            log_every_n(logger, logging.DEBUG, 30, "%d dirty regions in '%s'", len(self.last_dirty_regions), self.key)
+        return self.last_dirty_regions
+
+    def locate(self, image, screen, minSearchTime=0, debug=False, iteration=None, confidence=0.5, levels=1, top_k=5):
+        """Locate `image` on `screen`, skipping the search if the screen is unchanged since it was last run."""
+        self.observe(screen)
+
+        cache_key = (id(image), confidence, levels, top_k)
+        version = self.detector.version(self.key)
+        cached = self._results.get(cache_key)
+        if cached is not None and cached[0] is image and cached[1] == version:
+            self.hits += 1
+            logger.debug("Screen unchanged, reusing cached result %s", cached[2])
+            return cached[2]
+
+        self.misses += 1
+        result = self.search(image, screen, minSearchTime=minSearchTime, debug=debug, iteration=iteration,
+                             confidence=confidence, levels=levels, top_k=top_k)
+        self._results[cache_key] = (image, version, result)
+        return result
+
+    def clear(self):
+        self._results.clear()
+        self.detector.reset(self.key)
+
+
+class LocationPrior:
+    """
+    Search each template around its last known location before scanning the whole screen.
+
+    The Box of every successful search is remembered per template. The next search first matches only
+    inside that box grown by `padding` pixels, and falls back to `search` over the whole screen (the ROI,
+    when frames are captured from one) if nothing there scores above the confidence, or above `min_score`
+    when that is stricter. `locate` is a drop-in replacement for locate_on_screen. `hits` counts searches
+    answered from the prior window and `misses` those that had to widen.
+    """
+
+    def __init__(self, padding=8, min_score=None, search=locate_on_screen):
+        self.padding = padding
+        self.min_score = min_score
+        self.search = search
+        self.hits = 0
+        self.misses = 0
+        self._priors = {}
+
+    def locate(self, image, screen, minSearchTime=0, debug=False, iteration=None, confidence=0.5, levels=1, top_k=5):
+        """Locate `image` on `screen`, trying the window around its previous location first."""
+        prior = self._priors.get(id(image))
+        if prior is not None and prior[0] is image:
+            result = self._search_window(image, screen, prior[1], confidence)
+            if result:
+                self.hits += 1
+                self._priors[id(image)] = (image, result)
+                logger.debug("Found image near its previous location at %s", result)
+                return result
+            self.misses += 1
+            logger.debug("Image not near its previous location %s, searching the whole screen", prior[1])
+
+        result = self.search(image, screen, minSearchTime=minSearchTime, debug=debug, iteration=iteration,
+                             confidence=confidence, levels=levels, top_k=top_k)
+        if result:
+            self._priors[id(image)] = (image, result)
+        else:
+            self._priors.pop(id(image), None)
+        return result
+
+    def _search_window(self, image, screen, box, confidence):
+        """Best match of `image` in `box` grown by the padding, or None if it does not clear the threshold."""
+        screen_width, screen_height = screen.size if isinstance(screen, Image.Image) else np.shape(screen)[1::-1]
+        left, top = max(box.left - self.padding, 0), max(box.top - self.padding, 0)
+        right = min(box.left + box.width + self.padding, screen_width)
+        bottom = min(box.top + box.height + self.padding, screen_height)
+        if right - left < box.width or bottom - top < box.height:
+            return None
+
+        if isinstance(screen, Image.Image):
+            window = screen.crop((left, top, right, bottom))
+        else:
+            window = np.asarray(screen)[top:bottom, left:right]
+        template = image if isinstance(image, PreparedTemplate) else PreparedTemplate(image)
+        x, y, score = best_match(match_template(window, template))
+        threshold = confidence if self.min_score is None else max(confidence, self.min_score)
+        return Box(left + x, top + y, box.width, box.height) if score > threshold else None
+
+    def forget(self, image=None):
+        """Drop the remembered location of `image`, or of every template."""
+        if image is None:
+            self._priors.clear()
+        else:
+            self._priors.pop(id(image), None)
+
+
+def save_debug_info(image, screen, iteration=None, error_message=None, sink=None):
+    """
+    Queue debug information on `sink` (default: the module's DebugSink): the screen and, for failures, the
+    source image and the error message. Artifacts with an error message are recorded as failures; others
+    are subject to the sink's sampling.
+    """
+    sink = sink or debug_sink
+    iteration_str = f"_{iteration}" if iteration is not None else ""
+    failure = error_message is not None
+    if not sink.should_record(iteration, failure):
+        return
 
+    sink.save_image(screen, f"debug_screen{iteration_str}.png", iteration, failure)
     if error_message:
-        error_file = f"debug_error_message{iteration_str}.txt"
-        with open(error_file, 'w') as f:
-            f.write(error_message)
-        logger.info(f"Saved error message to {error_file}")
+        source = image.array if isinstance(image, PreparedTemplate) else image
+        sink.save_image(source, f"debug_source_image{iteration_str}.png", iteration, failure)
+        sink.save_text(error_message, f"debug_error_message{iteration_str}.txt", iteration, failure)
+    logger.info("Queued debug information for iteration %s in %s", iteration, sink.output_dir)